@@ -0,0 +1,184 @@
+"""
+Benchmark do pipeline de geração, sem interface gráfica (Tk).
+
+Cria uma árvore sintética de camadas no layout de ``assets_examples``
+(camada/raridade/*.png) e mede separadamente cada etapa: carregamento das camadas,
+seleção das combinações, composição, codificação e escrita dos metadados, além da
+geração completa. O resultado é um JSON que pode ser comparado entre commits.
+
+Uso:
+    python benchmarks/bench_pipeline.py --tokens 500 --layers 6 --size 512 --output bench.json
+    python benchmarks/bench_pipeline.py --compare antes.json depois.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import resource
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PIL import Image, ImageDraw
+from generator import NFTGenerator
+from layer_cache import LayerCache
+from utils import compose_layers
+from encoder import OutputSpec, encode_image
+from metadata_writer import MetadataWriter
+
+RARITIES = list(NFTGenerator.rarity_probabilities.keys())
+
+
+def build_layer_tree(root, layer_count, size, traits_per_rarity, seed=0):
+    """
+    Cria camadas sintéticas: a primeira é um fundo opaco e as demais têm uma forma
+    semitransparente sobre um fundo transparente, como as camadas de traços reais.
+
+    Returns:
+        list: Camadas no formato aceito por ``NFTGenerator.generate``.
+    """
+    rng = random.Random(seed)
+    layers = []
+    for index in range(layer_count):
+        name = f"Layer{index}"
+        for rarity in RARITIES:
+            directory = os.path.join(root, name, rarity)
+            os.makedirs(directory, exist_ok=True)
+            for trait in range(traits_per_rarity):
+                color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+                if index == 0:
+                    image = Image.new("RGBA", (size, size), color + (255,))
+                else:
+                    image = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+                    x, y = rng.randrange(size // 2), rng.randrange(size // 2)
+                    extent = rng.randrange(size // 8, size // 2)
+                    ImageDraw.Draw(image).ellipse([x, y, x + extent, y + extent], fill=color + (200,))
+                image.save(os.path.join(directory, f"{name}_{rarity}_{trait}.png"))
+        layers.append({"name": name, "path": os.path.join(root, name)})
+    return layers
+
+
+def peak_rss_bytes(who=resource.RUSAGE_SELF):
+    """
+    Pico de memória residente deste processo ou, com ``RUSAGE_CHILDREN``, do maior dos
+    processos filhos já encerrados (os processos de renderização com ``--workers``).
+    """
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(args):
+    results = {
+        "config": vars(args).copy(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "stages": {},
+    }
+    results["config"].pop("compare", None)
+    results["config"].pop("output", None)
+
+    with tempfile.TemporaryDirectory(prefix="felony-bench-") as workdir:
+        layers = build_layer_tree(os.path.join(workdir, "layers"), args.layers, args.size, args.traits)
+        generator = NFTGenerator()
+        stages = results["stages"]
+
+        layer_files, elapsed = timed(generator.load_layer_files_with_rarity, layers, None)
+        stages["layer_loading"] = {"seconds": elapsed}
+
+        plan, elapsed = timed(generator.plan, layer_files, args.tokens, seed=args.seed)
+        stages["selection"] = {"seconds": elapsed, "tokens_per_sec": args.tokens / elapsed}
+        combinations = [plan.combination(row) for row in range(len(plan))]
+
+        # Ordem de ID, como a geração completa: sem o cache de composições parciais
+        layer_cache = LayerCache()
+        composite_seconds = encode_seconds = 0.0
+        spec = OutputSpec(args.format)
+        for combination in combinations:
+            start = time.perf_counter()
+            image = compose_layers(combination, cache=layer_cache)
+            middle = time.perf_counter()
+            encode_image(image, spec)
+            composite_seconds += middle - start
+            encode_seconds += time.perf_counter() - middle
+        stages["compositing"] = {
+            "seconds": composite_seconds,
+            "tokens_per_sec": args.tokens / composite_seconds,
+            "layer_cache": layer_cache.stats(),
+        }
+        stages["encoding"] = {"seconds": encode_seconds, "tokens_per_sec": args.tokens / encode_seconds}
+
+        metadata_dir = os.path.join(workdir, "metadata_only")
+        os.makedirs(metadata_dir)
+        start = time.perf_counter()
+        with MetadataWriter(metadata_dir) as writer:
+            for nft_id, combination in enumerate(combinations, start=1):
+                writer.write(nft_id, generator.create_metadata(nft_id, combination))
+        elapsed = time.perf_counter() - start
+        stages["metadata_writing"] = {"seconds": elapsed, "tokens_per_sec": args.tokens / elapsed}
+
+        output_dir = os.path.join(workdir, "output")
+        stats, elapsed = timed(NFTGenerator().generate, layers, output_dir, max_nfts=args.tokens,
+                               image_format=args.format, seed=args.seed, workers=args.workers, verbose=False)
+        stages["end_to_end"] = {"seconds": elapsed, "tokens_per_sec": args.tokens / elapsed,
+                                "summary": stats.summary()}
+
+    results["peak_rss_bytes"] = peak_rss_bytes()
+    # O pool de renderização é encerrado ao fim da geração, então os filhos já foram aguardados
+    results["children_peak_rss_bytes"] = peak_rss_bytes(resource.RUSAGE_CHILDREN)
+    return results
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{'etapa':<24}{'antes (s)':>12}{'depois (s)':>12}{'variação':>10}")
+    for stage, data in after["stages"].items():
+        old = before["stages"].get(stage)
+        if old is None:
+            continue
+        change = (data["seconds"] - old["seconds"]) / old["seconds"] * 100 if old["seconds"] else 0.0
+        print(f"{stage:<24}{old['seconds']:>12.4f}{data['seconds']:>12.4f}{change:>9.1f}%")
+    for key in ("peak_rss_bytes", "children_peak_rss_bytes"):
+        # Resultados antigos não têm o pico dos processos filhos
+        print(f"{key:<24}{before.get(key, '-'):>12}{after.get(key, '-'):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de geração de NFTs.")
+    parser.add_argument("--tokens", type=int, default=200, help="Quantidade de NFTs.")
+    parser.add_argument("--layers", type=int, default=6, help="Quantidade de camadas.")
+    parser.add_argument("--size", type=int, default=256, help="Lado das imagens em pixels.")
+    parser.add_argument("--traits", type=int, default=3, help="Itens por raridade em cada camada.")
+    parser.add_argument("--format", default="png", help="Formato de saída das imagens.")
+    parser.add_argument("--workers", type=int, default=1, help="Processos na geração completa.")
+    parser.add_argument("--seed", type=int, default=1, help="Semente da geração.")
+    parser.add_argument("--output", help="Arquivo JSON de resultado (padrão: saída padrão).")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DEPOIS"),
+                        help="Compara dois arquivos de resultado em vez de executar o benchmark.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = json.dumps(run_benchmark(args), indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(results + "\n")
+    else:
+        print(results)
+
+
+if __name__ == "__main__":
+    main()
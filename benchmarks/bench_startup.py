@@ -0,0 +1,74 @@
+"""
+Benchmark da abertura do aplicativo (início a frio).
+
+Mede, em processos novos, o tempo de importação dos módulos de ``main.py`` e, quando
+há um display disponível, o tempo até a janela ficar pronta (``FELONY_STARTUP_BENCH``
+faz o aplicativo imprimir o tempo e fechar). O resultado é comparado com a meta
+``STARTUP_TARGET_SECONDS`` de ``main.py``; o código de saída é 1 se a meta não foi cumprida.
+
+Uso:
+    python benchmarks/bench_startup.py --runs 5 --output startup.json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+_IMPORT_SCRIPT = (
+    "import time, json; started = time.perf_counter(); import main; "
+    "print(json.dumps({'import_seconds': time.perf_counter() - started, "
+    "'target_seconds': main.STARTUP_TARGET_SECONDS}))"
+)
+
+
+def _run(command, env=None):
+    result = subprocess.run(command, cwd=SRC_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(runs):
+    """
+    Executa as medições ``runs`` vezes e resume pela mediana.
+
+    Returns:
+        dict: Tempos medianos de importação e de abertura da janela (None sem display) e a meta.
+    """
+    imports = [_run([sys.executable, "-c", _IMPORT_SCRIPT]) for _ in range(runs)]
+    target = imports[0]["target_seconds"]
+    env = dict(os.environ, FELONY_STARTUP_BENCH="1")
+    windows = [_run([sys.executable, "main.py"], env=env) for _ in range(runs)]
+    windows = [window["startup_seconds"] for window in windows if window is not None]
+    startup = statistics.median(windows) if windows else None
+    return {
+        "runs": runs,
+        "import_seconds": statistics.median(result["import_seconds"] for result in imports),
+        "startup_seconds": startup,
+        "target_seconds": target,
+        "meets_target": startup <= target if startup is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da abertura do aplicativo.")
+    parser.add_argument("--runs", type=int, default=5, help="Execuções por medição.")
+    parser.add_argument("--output", help="Arquivo JSON de resultado (padrão: saída padrão).")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.runs)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if results["meets_target"] is False else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
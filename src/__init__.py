@@ -1,5 +1,23 @@
 from .ui import NFTGeneratorApp
 from .generator import NFTGenerator
 from .utils import create_metadata, create_nft_image
+from .layer_cache import LayerCache
+from .planner import CombinationPlan, CombinationPlanner
+from .composite import PrefixCompositeCache
+from .journal import GenerationJournal
+from .metadata_writer import MetadataWriter
+from .encoder import ImageEncoder, OutputSpec
+from .stats import GenerationStats
+from .asset_index import AssetIndex
+from .asset_pack import AssetPack, build_asset_pack
+from .rarity import RarityEngine
+from .rules import TraitRules
+from .output_archive import ArchiveWriter, content_id
+from .job import GenerationJob
 
-__all__ = ["NFTGeneratorApp", "NFTGenerator", "create_metadata", "create_nft_image"]
+__all__ = ["NFTGeneratorApp", "NFTGenerator", "create_metadata", "create_nft_image", "LayerCache",
+           "CombinationPlan", "CombinationPlanner", "PrefixCompositeCache",
+           "GenerationJournal", "MetadataWriter",
+           "ImageEncoder", "OutputSpec", "GenerationStats", "AssetIndex",
+           "AssetPack", "build_asset_pack", "RarityEngine", "TraitRules",
+           "ArchiveWriter", "content_id", "GenerationJob"]
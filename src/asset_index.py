@@ -0,0 +1,166 @@
+import os
+import json
+import threading
+from collections import Counter
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+INDEX_VERSION = 3
+
+
+def default_index_path():
+    """
+    Caminho padrão do índice em disco, no diretório de cache do usuário.
+    """
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, "felony", "asset_index.json")
+
+
+class AssetIndex:
+    """
+    Índice persistente dos arquivos de camadas.
+
+    Cada diretório é listado com ``os.scandir`` e o resultado fica salvo em disco
+    junto com o mtime do diretório; enquanto o mtime não mudar (nenhum arquivo
+    adicionado, removido ou renomeado), o diretório não é listado de novo, com um
+    único ``stat`` por diretório. Para cada imagem são registrados as dimensões e o
+    modo lidos apenas do cabeçalho, sem decodificar os pixels.
+
+    Quando o diretório muda, cada arquivo é conferido pelo seu mtime e tamanho e só os
+    que mudaram têm o cabeçalho lido de novo. Um arquivo sobrescrito no lugar não muda
+    o mtime do diretório; com ``verify`` os arquivos são conferidos em toda listagem,
+    ao custo de um ``stat`` por arquivo.
+    """
+
+    def __init__(self, path=None, verify=False):
+        """
+        Args:
+            path (str): Arquivo JSON do índice; None usa ``default_index_path()``.
+                Uma string vazia mantém o índice só em memória.
+            verify (bool): Confere o mtime e o tamanho de cada arquivo mesmo se o
+                diretório não mudou.
+        """
+        self.path = default_index_path() if path is None else path
+        self.verify = verify
+        self._directories = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def scan(self, directory):
+        """
+        Lista as imagens de um diretório, usando o índice se o diretório não mudou.
+
+        Args:
+            directory (str): Diretório com as imagens.
+
+        Returns:
+            list: Entradas ordenadas por nome, com ``filename``, ``path``, ``size`` (largura, altura)
+                e ``mode``; ``size`` e ``mode`` são None se o cabeçalho não pôde ser lido.
+        """
+        directory = os.path.abspath(directory)
+        mtime = os.stat(directory).st_mtime_ns
+        with self._lock:
+            cached = self._directories.get(directory)
+            if cached is not None and cached["mtime"] == mtime and not self.verify:
+                files = cached["files"]
+            else:
+                previous = cached["files"] if cached is not None else {}
+                files = self._scan_directory(directory, previous)
+                if cached is None or cached["mtime"] != mtime or files != previous:
+                    self._directories[directory] = {"mtime": mtime, "files": files}
+                    self._dirty = True
+        return [
+            {"filename": name, "path": os.path.join(directory, name),
+             "size": tuple(info["size"]) if info["size"] else None, "mode": info["mode"]}
+            for name, info in sorted(files.items())
+        ]
+
+    def save(self):
+        """
+        Grava o índice em disco se houve alguma mudança. Falhas de escrita são ignoradas:
+        o índice é só um atalho e a próxima execução lista os diretórios de novo.
+        """
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            # Descarta diretórios que deixaram de existir para o índice não crescer indefinidamente
+            self._directories = {
+                directory: cached for directory, cached in self._directories.items() if os.path.isdir(directory)
+            }
+            data = {"version": INDEX_VERSION, "directories": self._directories}
+            temporary_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(temporary_path, "w") as f:
+                    json.dump(data, f, separators=(",", ":"))
+                os.replace(temporary_path, self.path)
+                self._dirty = False
+            except OSError:
+                pass
+
+    def _load(self):
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return  # Índice corrompido: é reconstruído
+        if data.get("version") == INDEX_VERSION:
+            self._directories = data.get("directories", {})
+
+    @staticmethod
+    def _scan_directory(directory, cached):
+        files = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                    continue
+                stat = entry.stat()  # Em POSIX, uma chamada de sistema por arquivo
+                previous = cached.get(entry.name)
+                if previous is not None and previous["mtime"] == stat.st_mtime_ns and previous["bytes"] == stat.st_size:
+                    files[entry.name] = previous
+                    continue
+                info = {"mtime": stat.st_mtime_ns, "bytes": stat.st_size}
+                try:
+                    # Image.open lê só o cabeçalho; os pixels não são decodificados
+                    with Image.open(entry.path) as image:
+                        info.update(size=list(image.size), mode=image.mode)
+                except (OSError, SyntaxError):
+                    info.update(size=None, mode=None)
+                files[entry.name] = info
+        return files
+
+
+def check_layer_sizes(entries):
+    """
+    Verifica se todas as imagens podem ser compostas entre si.
+
+    ``Image.alpha_composite`` exige imagens do mesmo tamanho; sem esta verificação uma
+    camada de tamanho diferente só falharia quando sorteada, no meio da geração.
+
+    Args:
+        entries (list): Entradas retornadas por ``AssetIndex.scan``.
+
+    Raises:
+        ValueError: Se há imagens ilegíveis ou de tamanhos diferentes.
+    """
+    unreadable = [entry["path"] for entry in entries if entry["size"] is None]
+    if unreadable:
+        raise ValueError(f"Imagens de camada ilegíveis: {_describe(unreadable)}")
+
+    sizes = Counter(entry["size"] for entry in entries)
+    if len(sizes) > 1:
+        expected = sizes.most_common(1)[0][0]
+        mismatched = [f"{entry['path']} ({entry['size'][0]}x{entry['size'][1]})"
+                      for entry in entries if entry["size"] != expected]
+        raise ValueError(f"Todas as camadas devem ter {expected[0]}x{expected[1]} pixels; "
+                         f"tamanhos diferentes: {_describe(mismatched)}")
+
+
+def _describe(paths, limit=5):
+    text = ", ".join(paths[:limit])
+    if len(paths) > limit:
+        text += f" e mais {len(paths) - limit}"
+    return text
@@ -0,0 +1,201 @@
+import os
+import sys
+import mmap
+import json
+import struct
+import argparse
+import threading
+from PIL import Image
+from asset_index import AssetIndex
+from layer_cache import layer_footprint
+
+PACK_MAGIC = b"FELPACK1"
+# Cabeçalho: assinatura, posição e tamanho do índice JSON no final do arquivo
+_HEADER = struct.Struct("<8sQQ")
+# Alinhamento de cada camada dentro do pacote
+_ALIGNMENT = 64
+
+
+def build_asset_pack(layer_root, pack_path, asset_index=None):
+    """
+    Converte todas as camadas sob ``layer_root`` em pixels RGBA crus em um único arquivo.
+
+    O pacote guarda as camadas uma após a outra, alinhadas, e termina com um índice
+    JSON de caminho -> posição, tamanho, área visível, mtime e tamanho em bytes do
+    arquivo de origem.
+    É gravado em um arquivo temporário e renomeado no final, então um pacote em uso
+    nunca fica pela metade.
+
+    Args:
+        layer_root (str): Diretório raiz das camadas (camada/raridade/*.png).
+        pack_path (str): Arquivo do pacote a ser criado.
+        asset_index (AssetIndex): Índice usado para listar os diretórios.
+
+    Returns:
+        int: Quantidade de camadas no pacote.
+    """
+    asset_index = asset_index if asset_index is not None else AssetIndex()
+    layers = {}
+    temporary_path = f"{pack_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(_HEADER.pack(PACK_MAGIC, 0, 0))
+        for directory in _walk_directories(os.path.abspath(layer_root)):
+            for entry in asset_index.scan(directory):
+                source_stat = os.stat(entry["path"])
+                with Image.open(entry["path"]) as source:
+                    image = source.convert("RGBA")
+                f.write(b"\0" * (-f.tell() % _ALIGNMENT))
+                bbox, opaque = layer_footprint(image)
+                layers[entry["path"]] = {
+                    "offset": f.tell(),
+                    "size": list(image.size),
+                    "mtime": source_stat.st_mtime_ns,
+                    "bytes": source_stat.st_size,
+                    "bbox": list(bbox) if bbox else None,
+                    "opaque": opaque,
+                }
+                f.write(image.tobytes())
+        index_offset = f.tell()
+        index = json.dumps({"layers": layers}, separators=(",", ":")).encode("utf-8")
+        f.write(index)
+        f.seek(0)
+        f.write(_HEADER.pack(PACK_MAGIC, index_offset, len(index)))
+    os.replace(temporary_path, pack_path)
+    asset_index.save()
+    return len(layers)
+
+
+def _walk_directories(root):
+    yield root
+    with os.scandir(root) as entries:
+        subdirectories = sorted(entry.path for entry in entries if entry.is_dir())
+    for directory in subdirectories:
+        yield from _walk_directories(directory)
+
+
+class AssetPack:
+    """
+    Pacote de camadas mapeado em memória, com a mesma interface de leitura do ``LayerCache``.
+
+    ``get`` devolve imagens que apontam direto para o mapeamento, sem decodificar nem
+    copiar pixels; processos que abrem o mesmo pacote compartilham as mesmas páginas
+    do cache do sistema operacional. Camadas fora do pacote são lidas do ``fallback``.
+    Ao abrir, as camadas cujo arquivo de origem mudou depois da criação do pacote
+    (ver ``stale_paths``) saem do índice e também passam a ser lidas do ``fallback``;
+    reconstrua o pacote depois de editar as camadas para voltar a usá-lo por inteiro.
+    """
+
+    def __init__(self, pack_path, fallback=None):
+        """
+        Args:
+            pack_path (str): Arquivo criado por ``build_asset_pack``.
+            fallback (LayerCache): Cache usado para camadas que não estão no pacote;
+                sem ele essas camadas são decodificadas a cada leitura.
+        """
+        self.path = pack_path
+        self.fallback = fallback
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with open(pack_path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_offset, index_length = _HEADER.unpack_from(self._map, 0)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"Arquivo não é um pacote de camadas: {pack_path}")
+        index = json.loads(self._map[index_offset:index_offset + index_length])
+        self._layers = index["layers"]
+        self._buffer = memoryview(self._map)
+        # Camadas editadas depois da criação do pacote são lidas do disco
+        self.stale = self.stale_paths()
+        for path in self.stale:
+            del self._layers[path]
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self._layers
+
+    def __len__(self):
+        return len(self._layers)
+
+    def get(self, path):
+        """
+        Retorna a camada em RGBA apontando para o mapeamento, sem cópia.
+
+        A imagem é somente leitura e compartilhada entre chamadas.
+
+        Args:
+            path (str): Caminho do arquivo da camada.
+
+        Returns:
+            PIL.Image.Image: Camada em RGBA.
+        """
+        layer = self._layers.get(os.path.abspath(path))
+        with self._lock:
+            if layer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if layer is None:
+            if self.fallback is not None:
+                return self.fallback.get(path)
+            with Image.open(path) as source:
+                return source.convert("RGBA")
+
+        width, height = layer["size"]
+        offset = layer["offset"]
+        pixels = self._buffer[offset:offset + width * height * 4]
+        return Image.frombuffer("RGBA", (width, height), pixels, "raw", "RGBA", 0, 1)
+
+    def footprint(self, path, image):
+        """
+        Retorna a área visível da camada, gravada no índice do pacote (ver ``LayerCache.footprint``).
+        """
+        layer = self._layers.get(os.path.abspath(path))
+        if layer is None:
+            if hasattr(self.fallback, "footprint"):
+                return self.fallback.footprint(path, image)
+            return layer_footprint(image)
+        if "opaque" not in layer:
+            # Pacote criado antes do índice guardar a área visível
+            bbox, layer["opaque"] = layer_footprint(image)
+            layer["bbox"] = list(bbox) if bbox else None
+        return (tuple(layer["bbox"]) if layer["bbox"] else None), layer["opaque"]
+
+    def stale_paths(self):
+        """
+        Lista as camadas do pacote cujo arquivo de origem mudou ou foi removido.
+        """
+        stale = []
+        for path, layer in self._layers.items():
+            try:
+                source_stat = os.stat(path)
+            except FileNotFoundError:
+                stale.append(path)
+                continue
+            if source_stat.st_mtime_ns != layer["mtime"] or source_stat.st_size != layer.get("bytes", source_stat.st_size):
+                stale.append(path)
+        return stale
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._layers),
+                "stale": len(self.stale),
+                "pack_bytes": len(self._map),
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cria um pacote de camadas mapeável em memória.")
+    parser.add_argument("layer_root", help="Diretório raiz das camadas (camada/raridade/*.png).")
+    parser.add_argument("pack_path", help="Arquivo do pacote a ser criado.")
+    args = parser.parse_args(argv)
+    count = build_asset_pack(args.layer_root, args.pack_path)
+    print(f"Pacote de camadas criado: {args.pack_path} ({count} camadas).")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
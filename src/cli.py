@@ -0,0 +1,203 @@
+import sys
+import json
+import time
+import argparse
+from generator import NFTGenerator
+from stats import GenerationStats
+from output_layout import DEFAULT_SHARD_SIZE, LARGE_COLLECTION_THRESHOLD
+from plan_file import read_plan_header, shard_range
+from output_archive import DEFAULT_IMAGE_URI, ARCHIVE_FORMATS
+
+# Intervalo mínimo entre atualizações da linha de progresso, em segundos
+PROGRESS_INTERVAL = 0.5
+
+
+class ProgressLine:
+    """
+    Gancho de ``GenerationStats`` que mantém uma única linha de progresso no terminal.
+    """
+
+    def __init__(self, total, stream=None):
+        self.total = total
+        self.stream = stream if stream is not None else sys.stderr
+        self._last = 0.0
+
+    def __call__(self, event):
+        if event["event"] == "token":
+            # Ao retomar, o total do evento desconta as NFTs já concluídas
+            total = event.get("total") or self.total
+            now = time.perf_counter()
+            if now - self._last < PROGRESS_INTERVAL and event["tokens"] != total:
+                return
+            self._last = now
+            rate = event["tokens"] / event["elapsed"] if event["elapsed"] else 0.0
+            self.stream.write(f"\r{event['tokens']}/{total} NFTs renderizadas ({rate:.1f} NFTs/s)")
+            self.stream.flush()
+        elif event["event"] == "finish":
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+def load_config(path):
+    """
+    Lê um arquivo salvo por ``NFTGeneratorApp.save_config``.
+    """
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def parse_shard(value):
+    """
+    Converte ``"k/n"`` em ``(k, n)``.
+    """
+    try:
+        shard, shards = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Parte inválida: '{value}'. Use k/n, por exemplo 2/4.")
+    if not 1 <= shard <= shards:
+        raise argparse.ArgumentTypeError(f"Parte inválida: '{value}'. k deve estar entre 1 e n.")
+    return shard, shards
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Gera NFTs sem interface gráfica a partir de um arquivo de configurações salvo pelo aplicativo."
+    )
+    parser.add_argument("config", help="Arquivo JSON de configurações (Salvar Configurações).")
+    parser.add_argument("--max-nfts", type=int, help="Quantidade de NFTs (padrão: a da configuração).")
+    parser.add_argument("--output-dir", help="Diretório de saída (padrão: o da configuração).")
+    parser.add_argument("--format", dest="image_format", help="Formato das imagens (padrão: o da configuração).")
+    parser.add_argument("--rarities", nargs="+", metavar="RARIDADE",
+                        help="Raridades usadas (padrão: as da configuração; nenhuma significa todas).")
+    parser.add_argument("--outputs", nargs="+", metavar="SAIDA",
+                        help='Saídas de imagem, por exemplo "png@full:c1" "webp@1024:q85" (ver OutputSpec).')
+    parser.add_argument("--rules", help="Arquivo JSON de regras de traços (padrão: o da configuração).")
+    parser.add_argument("--seed", type=int, help="Semente da geração (padrão: aleatória).")
+    parser.add_argument("--resume", action="store_true", help="Retoma a geração interrompida no diretório de saída.")
+    parser.add_argument("--workers", type=int, default=1, help="Processos de renderização.")
+    parser.add_argument("--encode-workers", type=int, default=2, help="Threads de codificação no modo serial.")
+    parser.add_argument("--render-order", choices=("id", "prefix"), default="id", help="Ordem de renderização.")
+    parser.add_argument("--asset-pack", help="Pacote de camadas criado por asset_pack.py.")
+    parser.add_argument("--shard-size", type=int,
+                        help=f"NFTs por subdiretório; 0 desativa (padrão: {DEFAULT_SHARD_SIZE} acima de "
+                             f"{LARGE_COLLECTION_THRESHOLD} NFTs).")
+    parser.add_argument("--compact-metadata", action="store_true", help="Grava os JSON de metadados sem indentação.")
+    parser.add_argument("--metadata-jsonl", action="store_true", help="Também grava metadata.jsonl.")
+    parser.add_argument("--no-rarity-ranking", action="store_true", help="Não calcula o ranking de raridade.")
+    parser.add_argument("--image-uri", default=DEFAULT_IMAGE_URI,
+                        help='Modelo do campo "image" com {id}, {sha256} e {cid}, por exemplo "ipfs://{cid}" '
+                             f'(padrão: "{DEFAULT_IMAGE_URI}").')
+    parser.add_argument("--archive", metavar="PACOTE",
+                        help=f"Grava imagens e metadados direto neste pacote ({', '.join(ARCHIVE_FORMATS)}) "
+                             "dentro do diretório de saída, em vez de arquivos soltos.")
+    parser.add_argument("--stats", help="Grava o resumo da geração (tempos por etapa) neste arquivo JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Imprime uma linha por NFT em vez do progresso.")
+
+    distributed = parser.add_argument_group("geração distribuída")
+    distributed.add_argument("--write-plan", metavar="PLANO",
+                             help="Só planeja a coleção e grava a combinação de cada ID neste arquivo.")
+    distributed.add_argument("--plan", metavar="PLANO", help="Renderiza a partir de um arquivo de plano.")
+    distributed.add_argument("--shard", type=parse_shard, metavar="K/N",
+                             help="Renderiza só a parte K de N da coleção do --plan.")
+    distributed.add_argument("--merge", action="store_true",
+                             help="Confere e junta as partes já renderizadas do --plan no diretório de saída.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    config = load_config(args.config)
+
+    layers = [{"name": layer["name"], "path": layer["path"]} for layer in config.get("layers", [])]
+    output_dir = args.output_dir or config.get("output_dir")
+    max_nfts = args.max_nfts if args.max_nfts is not None else int(config.get("max_nfts") or 0)
+    rarities = args.rarities if args.rarities is not None else config.get("rarities")
+    rules = args.rules or config.get("rules") or None
+    if not layers:
+        print("Erro: nenhuma camada na configuração.", file=sys.stderr)
+        return 1
+    if (args.shard or args.merge) and not args.plan:
+        print("Erro: --shard e --merge exigem --plan.", file=sys.stderr)
+        return 1
+
+    generator = NFTGenerator(asset_pack=args.asset_pack, image_uri=args.image_uri)
+    if args.plan:
+        # A quantidade, a semente, as raridades e as regras vêm do arquivo de plano
+        max_nfts = read_plan_header(args.plan)["max_nfts"]
+    elif max_nfts < 1:
+        print("Erro: a quantidade de NFTs deve ser pelo menos 1.", file=sys.stderr)
+        return 1
+
+    if args.write_plan:
+        try:
+            plan = generator.write_plan(layers, args.write_plan, max_nfts, rarities=set(rarities) if rarities else None,
+                                        seed=args.seed, rules=rules)
+        except (ValueError, OSError) as e:
+            print(f"Erro ao planejar a coleção: {e}", file=sys.stderr)
+            return 1
+        print(f"Plano gravado em {args.write_plan}: {plan.summary()}")
+        return 0
+
+    if not output_dir:
+        print("Erro: informe o diretório de saída.", file=sys.stderr)
+        return 1
+
+    if args.merge:
+        try:
+            merged = generator.merge_shards(layers, output_dir, args.plan, pretty_metadata=not args.compact_metadata,
+                                            metadata_jsonl=args.metadata_jsonl,
+                                            rarity_ranking=not args.no_rarity_ranking)
+        except (ValueError, OSError) as e:
+            print(f"Erro ao juntar as partes: {e}", file=sys.stderr)
+            return 1
+        print(f"Coleção completa: {merged['tokens']} NFTs de {merged['shards']} partes em {output_dir}.")
+        return 0
+
+    shard_size = args.shard_size
+    if shard_size is None:
+        # Mesmo critério da interface, para que uma geração possa ser retomada em qualquer um dos dois
+        shard_size = DEFAULT_SHARD_SIZE if max_nfts > LARGE_COLLECTION_THRESHOLD else None
+
+    total = max_nfts if args.shard is None else len(range(*shard_range(max_nfts, *args.shard)))
+    # Com --verbose o gerador já imprime cada NFT e o resumo final
+    stats = GenerationStats(hooks=[] if args.verbose else [ProgressLine(total)])
+    job = generator.start(
+        layers, output_dir, max_nfts=None if args.plan else max_nfts,
+        image_format=args.image_format or config.get("image_format", "png"),
+        rarities=set(rarities) if rarities and not args.plan else None,
+        workers=args.workers, render_order=args.render_order, resume=args.resume, seed=args.seed,
+        pretty_metadata=not args.compact_metadata, metadata_jsonl=args.metadata_jsonl,
+        outputs=args.outputs, encode_workers=args.encode_workers, stats=stats, verbose=args.verbose,
+        rarity_ranking=not args.no_rarity_ranking,
+        shard_size=shard_size or None, rules=None if args.plan else rules,
+        plan_file=args.plan, shard=args.shard, archive=args.archive,
+    )
+    try:
+        while not job.wait(PROGRESS_INTERVAL):
+            pass
+    except KeyboardInterrupt:
+        # Ctrl+C cancela sem perder as NFTs em andamento; um segundo Ctrl+C interrompe na hora
+        print("\nCancelando: concluindo as NFTs em andamento...", file=sys.stderr)
+        job.cancel()
+        job.wait()
+    try:
+        stats = job.result()
+    except (ValueError, OSError) as e:
+        print(f"\nErro ao gerar NFTs: {e}", file=sys.stderr)
+        return 1
+    if job.cancelled:
+        hint = "" if args.archive else " Continue com --resume."
+        print(f"Geração cancelada: {stats.tokens} NFTs concluídas em {output_dir}.{hint}", file=sys.stderr)
+        return 130
+
+    if args.stats:
+        stats.to_json(args.stats)
+    if not args.verbose:
+        summary = stats.summary()
+        print(f"Geração de NFTs concluída: {summary['tokens']} NFTs em {summary['wall_seconds']:.1f}s "
+              f"({summary['tokens_per_sec']:.1f} NFTs/s) em {output_dir}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from layer_cache import layer_footprint
+
+# Orçamento padrão de memória para as composições intermediárias (128 MB)
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+def composite_over(base, overlay, footprint, owned=False):
+    """
+    Compõe ``overlay`` sobre ``base`` tocando só a área visível da camada.
+
+    Uma camada toda opaca substitui a base e uma toda transparente é ignorada; nas
+    demais só o bbox do alfa é composto. O resultado é idêntico, pixel a pixel, ao de
+    ``Image.alpha_composite``.
+
+    Args:
+        base (PIL.Image.Image): Imagem composta até aqui.
+        overlay (PIL.Image.Image): Camada em RGBA.
+        footprint (tuple): Área visível da camada (ver ``layer_footprint``).
+        owned (bool): True se ``base`` pode ser alterada no lugar; se False ela é copiada
+            antes, pois pode estar em um cache.
+
+    Returns:
+        tuple: (imagem composta, True se ela pode ser alterada no lugar pela próxima camada).
+    """
+    if overlay.size != base.size:
+        raise ValueError(f"Camadas com tamanhos diferentes: {base.size} e {overlay.size}.")
+    bbox, opaque = footprint
+    if opaque:
+        return overlay, False
+    if bbox is None:
+        return base, owned
+    if not owned:
+        base = base.copy()
+    base.alpha_composite(overlay, dest=bbox[:2], source=bbox)
+    return base, True
+
+
+def _own_footprint(path, image):
+    return layer_footprint(image)
+
+
+class _TrieNode:
+    __slots__ = ("parent", "key", "children", "image", "nbytes")
+
+    def __init__(self, parent=None, key=None):
+        self.parent = parent
+        self.key = key
+        self.children = {}
+        self.image = None
+        self.nbytes = 0
+
+
+class PrefixCompositeCache:
+    """
+    Cache de composições parciais organizado como uma trie de prefixos.
+
+    Cada nó da trie representa uma sequência de camadas a partir da base (por exemplo
+    Background + Head + T-shirt) e pode guardar a imagem já composta dessa sequência.
+    NFTs que compartilham as camadas inferiores reaproveitam o maior prefixo em cache
+    e só compõem as camadas restantes. Os nós mais antigos perdem a imagem quando o
+    total de bytes ultrapassa ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.composites = 0  # Chamadas a alpha_composite realizadas
+        self.naive_composites = 0  # Chamadas que a composição camada a camada faria
+        self.evictions = 0
+        self._root = _TrieNode()
+        self._lru = OrderedDict()  # nó -> None, do menos para o mais usado
+        self._lock = threading.Lock()
+
+    def compose(self, layers, load, footprint=None):
+        """
+        Compõe a pilha de camadas reaproveitando o maior prefixo em cache.
+
+        A imagem retornada pode ser compartilhada com o cache e não deve ser alterada.
+
+        Args:
+            layers (list): Itens da combinação, na ordem de empilhamento.
+            load (function): Função que recebe um caminho e retorna a camada em RGBA.
+            footprint (function): Função que recebe o caminho e a camada e retorna a área
+                visível (ver ``LayerCache.footprint``); calculada a cada camada se omitida.
+
+        Returns:
+            PIL.Image.Image: Imagem final composta.
+        """
+        footprint = footprint or _own_footprint
+        keys = [layer["file"] for layer in layers]
+        self.naive_composites += len(keys) - 1
+
+        with self._lock:
+            node, depth, image = self._root, 0, None
+            for index, key in enumerate(keys[:-1]):
+                node = node.children.get(key)
+                if node is None:
+                    break
+                if node.image is not None:
+                    depth, image = index + 1, node.image
+                    self._lru.move_to_end(node)
+
+        if image is None:
+            depth, image = 1, load(keys[0])
+
+        owned = False  # Imagens vindas dos caches não podem ser alteradas
+        for index in range(depth, len(keys)):
+            overlay = load(keys[index])
+            image, owned = composite_over(image, overlay, footprint(keys[index], overlay), owned)
+            self.composites += 1
+            # A pilha completa é única por NFT, então só os prefixos são guardados
+            if index < len(keys) - 1:
+                self._store(keys[:index + 1], image)
+                owned = False
+        return image
+
+    def _store(self, keys, image):
+        nbytes = image.width * image.height * 4
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            node = self._root
+            for key in keys:
+                child = node.children.get(key)
+                if child is None:
+                    child = node.children[key] = _TrieNode(node, key)
+                node = child
+            if node.image is not None:
+                self.current_bytes -= node.nbytes
+            node.image, node.nbytes = image, nbytes
+            self.current_bytes += nbytes
+            self._lru[node] = None
+            self._lru.move_to_end(node)
+
+            while self.current_bytes > self.max_bytes and self._lru:
+                evicted, _ = self._lru.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                evicted.image, evicted.nbytes = None, 0
+                self.evictions += 1
+                self._prune(evicted)
+
+    def _prune(self, node):
+        # Remove nós sem imagem e sem filhos para a trie não crescer indefinidamente
+        while node.parent is not None and node.image is None and not node.children:
+            del node.parent.children[node.key]
+            node = node.parent
+
+    def stats(self):
+        """
+        Retorna os contadores de reaproveitamento.
+
+        Returns:
+            dict: Composições feitas, composições da abordagem ingênua e economizadas.
+        """
+        return {
+            "composites": self.composites,
+            "naive_composites": self.naive_composites,
+            "saved_composites": self.naive_composites - self.composites,
+            "evictions": self.evictions,
+            "current_bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def prefix_order(plan):
+    """
+    Ordena as linhas do plano para maximizar o reaproveitamento de prefixos.
+
+    A ordenação lexicográfica pelos índices das camadas, da base para o topo,
+    coloca lado a lado as NFTs que compartilham as camadas inferiores.
+
+    Args:
+        plan (CombinationPlan): Plano de combinações.
+
+    Returns:
+        np.ndarray: Índices das linhas do plano na ordem de renderização.
+    """
+    if len(plan) == 0:
+        return np.empty(0, dtype=np.int64)
+    # lexsort usa a última chave como a principal
+    return np.lexsort(plan.indices.T[::-1])
+
+
+def count_prefix_savings(plan, order=None):
+    """
+    Conta as composições economizadas pelo cache de prefixos sem renderizar nada.
+
+    Considera um cache sem limite de memória, então é o teto do reaproveitamento
+    para o plano e a ordem informados.
+
+    Args:
+        plan (CombinationPlan): Plano de combinações.
+        order (array-like): Ordem de renderização; a ordem dos IDs se omitida.
+
+    Returns:
+        dict: Composições ingênuas, composições com o cache e economizadas.
+    """
+    order = range(len(plan)) if order is None else order
+    seen = set()
+    naive = composites = 0
+    for row in order:
+        keys = tuple(item["file"] for item in plan.combination(row))
+        naive += len(keys) - 1
+        depth = 1
+        for length in range(len(keys) - 1, 1, -1):
+            if keys[:length] in seen:
+                depth = length
+                break
+        composites += len(keys) - depth
+        for length in range(2, len(keys)):
+            seen.add(keys[:length])
+    return {"naive_composites": naive, "composites": composites, "saved_composites": naive - composites}
@@ -0,0 +1,220 @@
+import os
+import io
+import time
+import hashlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from PIL import Image
+from output_layout import ShardedLayout
+
+# Formatos suportados: extensão -> formato do Pillow
+FORMATS = {
+    "png": "PNG",
+    "jpg": "JPEG",
+    "jpeg": "JPEG",
+    "webp": "WEBP",
+}
+# Formatos sem canal alfa, que precisam ter a transparência achatada sobre um fundo
+OPAQUE_FORMATS = {"JPEG"}
+
+
+class OutputSpec:
+    """
+    Descrição de uma saída de imagem: formato, tamanho e opções de compressão.
+
+    Pode ser criada a partir de texto no formato ``formato@tamanho[:opção...]``, por exemplo
+    ``png@full``, ``webp@1024:q85``, ``jpg@256`` ou ``png@full:c1``. As opções são
+    ``qN`` (qualidade JPEG/WebP), ``cN`` (``compress_level`` do PNG, 0-9) e ``mN``
+    (``method`` do WebP, 0-6).
+    """
+
+    def __init__(self, image_format="png", size=None, quality=None, compress_level=None, method=None,
+                 background=(255, 255, 255)):
+        """
+        Args:
+            image_format (str): Extensão da saída ("png", "jpg", "jpeg" ou "webp").
+            size (int): Maior lado da imagem em pixels; None mantém o tamanho original.
+            quality (int): Qualidade JPEG/WebP.
+            compress_level (int): Nível de compressão do PNG (0 mais rápido, 9 menor arquivo).
+            method (int): Esforço de compressão do WebP (0 mais rápido, 6 menor arquivo).
+            background (tuple): Cor RGB usada para achatar a transparência em formatos opacos.
+        """
+        image_format = image_format.lower().lstrip(".")
+        if image_format not in FORMATS:
+            raise ValueError(f"Formato de imagem não suportado: '{image_format}'.")
+        self.extension = image_format
+        self.pil_format = FORMATS[image_format]
+        self.size = size
+        self.quality = quality
+        self.compress_level = compress_level
+        self.method = method
+        self.background = background
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Cria uma OutputSpec a partir de texto (``webp@1024:q85``), de um dict ou de outra OutputSpec.
+        """
+        if isinstance(spec, OutputSpec):
+            return spec
+        if isinstance(spec, dict):
+            return cls(**spec)
+
+        image_format, _, rest = spec.partition("@")
+        size_text, *options = rest.split(":") if rest else ["full"]
+        kwargs = {"size": None if size_text in ("", "full") else int(size_text)}
+        names = {"q": "quality", "c": "compress_level", "m": "method"}
+        for option in options:
+            if option[:1] not in names or not option[1:].isdigit():
+                raise ValueError(f"Opção de saída inválida: '{option}' em '{spec}'.")
+            kwargs[names[option[0]]] = int(option[1:])
+        return cls(image_format, **kwargs)
+
+    @property
+    def label(self):
+        return f"{self.extension}@{self.size or 'full'}"
+
+    @property
+    def text(self):
+        """
+        Texto que recria a saída com ``parse``, incluindo as opções de compressão.
+        """
+        options = [f"{prefix}{value}" for prefix, value in
+                   (("q", self.quality), ("c", self.compress_level), ("m", self.method)) if value is not None]
+        return ":".join([self.label] + options)
+
+    def save_options(self):
+        options = {}
+        if self.quality is not None:
+            options["quality"] = self.quality
+        if self.compress_level is not None and self.pil_format == "PNG":
+            options["compress_level"] = self.compress_level
+        if self.method is not None and self.pil_format == "WEBP":
+            options["method"] = self.method
+        return options
+
+    def __repr__(self):
+        return f"OutputSpec({self.label!r})"
+
+
+def encode_image(image, spec):
+    """
+    Codifica uma imagem de acordo com a OutputSpec, sem alterar a imagem original.
+
+    Returns:
+        bytes: Conteúdo do arquivo codificado.
+    """
+    if spec.size and max(image.size) != spec.size:
+        scale = spec.size / max(image.size)
+        new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(new_size, Image.LANCZOS)
+
+    if spec.pil_format in OPAQUE_FORMATS and image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        flattened = Image.new("RGB", image.size, spec.background)
+        flattened.paste(image, mask=image.getchannel("A"))
+        image = flattened
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=spec.pil_format, **spec.save_options())
+    return buffer.getvalue()
+
+
+class ImageEncoder:
+    """
+    Etapa de codificação: recebe a imagem composta uma única vez e grava todas as saídas.
+
+    A primeira saída vai para ``image_dir`` e as demais para diretórios irmãos nomeados
+    pelo formato e tamanho (por exemplo ``nfts_webp_1024``). Com ``workers`` > 0 a
+    codificação roda em um pool de threads próprio, em paralelo com a composição.
+    O SHA-256 da saída principal é calculado sobre os bytes em memória, antes da escrita.
+    """
+
+    def __init__(self, outputs, image_dir, workers=2, stats=None, shard_size=None, archive=None):
+        """
+        Args:
+            outputs (list): Saídas (OutputSpec, texto ou dict); a primeira é a principal.
+            image_dir (str): Diretório da saída principal.
+            workers (int): Threads de codificação; 0 codifica na thread que chamar ``submit``.
+            stats (GenerationStats): Instrumentação opcional; o tempo vai para a etapa ``encode``.
+            shard_size (int): NFTs por subdiretório de saída (ver ``ShardedLayout``); None grava
+                todas no mesmo diretório.
+            archive (ArchiveWriter): Grava as imagens neste pacote, com os mesmos caminhos
+                relativos ao diretório de saída, em vez de arquivos soltos.
+        """
+        self.stats = stats
+        self.layout = ShardedLayout(shard_size)
+        self.outputs = [OutputSpec.parse(spec) for spec in outputs]
+        if not self.outputs:
+            raise ValueError("Nenhuma saída de imagem configurada.")
+        self.directories = [image_dir] + [
+            f"{image_dir}_{spec.extension}_{spec.size or 'full'}" for spec in self.outputs[1:]
+        ]
+        self.archive = archive
+        self._root = os.path.dirname(image_dir)
+        if archive is None:
+            for directory in self.directories:
+                os.makedirs(directory, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="encoder") if workers > 0 else None
+
+    def paths(self, nft_id):
+        """
+        Retorna os caminhos de todas as saídas de uma NFT; o primeiro é o da saída principal.
+        """
+        return self._paths(nft_id, create=False)
+
+    def _paths(self, nft_id, create):
+        return [
+            self.layout.path(directory, nft_id, f"NFT_{nft_id}.{spec.extension}", create=create)
+            for directory, spec in zip(self.directories, self.outputs)
+        ]
+
+    def encode(self, image, nft_id, stats=None):
+        """
+        Codifica e grava todas as saídas de uma NFT.
+
+        Args:
+            image (PIL.Image.Image): Imagem composta.
+            nft_id (int): ID da NFT.
+            stats (GenerationStats): Instrumentação a usar no lugar da do codificador.
+
+        Returns:
+            str: SHA-256 da saída principal.
+        """
+        stats = stats or self.stats
+        start = time.perf_counter()
+        checksum = None
+        for path, spec in zip(self._paths(nft_id, create=self.archive is None), self.outputs):
+            data = encode_image(image, spec)
+            if checksum is None:
+                checksum = hashlib.sha256(data).hexdigest()
+            self._store(path, data)
+        if stats is not None:
+            stats.add("encode", time.perf_counter() - start)
+        return checksum
+
+    def _store(self, path, data):
+        if self.archive is None:
+            with open(path, "wb") as f:
+                f.write(data)
+        else:
+            self.archive.add(os.path.relpath(path, self._root).replace(os.sep, "/"), data)
+
+    def submit(self, image, nft_id):
+        """
+        Agenda a codificação de uma NFT no pool de codificação.
+
+        Returns:
+            Future: Resultado com o SHA-256 da saída principal.
+        """
+        if self._pool is not None:
+            return self._pool.submit(self.encode, image, nft_id)
+        future = Future()
+        try:
+            future.set_result(self.encode(image, nft_id))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def close(self, cancel=False):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=cancel)
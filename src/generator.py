@@ -1,9 +1,158 @@
 import os
 import random
+import secrets
 import json
-import csv
+import time
+import queue
+import signal
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from PIL import Image
-from utils import create_metadata, create_nft_image
+from utils import create_metadata, compose_layers
+from layer_cache import LayerCache
+from planner import CombinationPlanner, CombinationSet
+from rules import TraitRules
+from plan_file import save_plan, load_plan, read_plan_header, plan_digest, shard_range, shard_directory, find_shards
+from composite import PrefixCompositeCache, prefix_order
+from journal import GenerationJournal, PREVIOUS_COMBINATIONS_FILENAME
+from metadata_writer import MetadataWriter
+from encoder import ImageEncoder, OutputSpec
+from stats import GenerationStats
+from asset_index import AssetIndex, check_layer_sizes
+from asset_pack import AssetPack
+from rarity import RarityEngine, RARITY_FILENAME
+from output_layout import ShardedLayout
+from job import GenerationJob
+from output_archive import (DEFAULT_IMAGE_URI, ArchiveWriter, CollectedFiles, ContentDigests, format_image_uri,
+                       uses_content_hash)
+
+# Caches e codificador de cada processo de renderização paralela
+_worker_layer_cache = None
+_worker_composite_cache = None
+_worker_encoder = None
+
+def _init_render_worker(max_bytes, composite_max_bytes, outputs, image_dir, pack_path=None,
+                        shard_size=None, collect=False):
+    global _worker_layer_cache, _worker_composite_cache, _worker_encoder
+    # Ctrl+C chega a todo o grupo de processos: só o processo principal cancela a geração,
+    # e os processos de renderização concluem as NFTs em andamento
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_layer_cache = LayerCache(max_bytes)
+    if pack_path:
+        # Todos os processos mapeiam o mesmo arquivo: as camadas não são decodificadas nem copiadas
+        _worker_layer_cache = AssetPack(pack_path, fallback=_worker_layer_cache)
+    # Sem reaproveitamento de prefixos (ordem de ID) o cache só custaria cópias das composições
+    _worker_composite_cache = PrefixCompositeCache(composite_max_bytes) if composite_max_bytes is not None else None
+    # Com um pacote os arquivos voltam para o processo principal, o único que escreve no pacote
+    _worker_encoder = ImageEncoder(outputs, image_dir, workers=0, shard_size=shard_size,
+                                   archive=CollectedFiles() if collect else None)
+
+def _render_nft_worker(combination, nft_id):
+    """
+    Compõe e codifica todas as saídas de uma NFT dentro de um processo do pool de renderização.
+
+    Returns:
+        tuple: SHA-256 da saída principal, tempos por etapa medidos no processo e os
+        arquivos ``(nome, bytes)`` destinados ao pacote (None sem pacote).
+    """
+    stats = GenerationStats()
+    image = _compose_measured(combination, _worker_layer_cache, _worker_composite_cache, stats)
+    checksum = _worker_encoder.encode(image, nft_id, stats=stats)
+    files = _worker_encoder.archive.drain() if _worker_encoder.archive is not None else None
+    return checksum, stats.measured(), files
+
+def _compose_measured(combination, layer_cache, composite_cache, stats):
+    """
+    Compõe as camadas separando o tempo de carregamento das camadas do tempo de composição.
+    """
+    load_before = stats.stage_seconds["layer_load"]
+    start = time.perf_counter()
+    image = compose_layers(combination, cache=stats.timed_cache(layer_cache), composite_cache=composite_cache)
+    load_time = stats.stage_seconds["layer_load"] - load_before
+    stats.add("composite", time.perf_counter() - start - load_time)
+    return image
+
+class _GenerationRun:
+    """
+    Destinos de uma geração em andamento: metadados, diário, ranking, pacote, hashes,
+    callback e instrumentação.
+    """
+
+    def __init__(self, metadata_writer, journal, rarity, callback, stats, verbose, archive=None, digests=None):
+        self.metadata_writer = metadata_writer
+        self.archive = archive
+        self.digests = digests
+        self.rarity = rarity
+        self.journal = journal
+        self.callback = callback
+        self.stats = stats
+        self.verbose = verbose
+
+class _FinishStage:
+    """
+    Última etapa da geração, em uma thread própria: espera cada NFT renderizada, na ordem
+    de envio, e registra metadados, diário, ranking e callback.
+
+    A fila limitada entre a renderização e esta etapa dá a contrapressão: com o disco ou
+    o callback lentos a composição para quando a fila enche, sem esperar a cada NFT.
+    """
+
+    def __init__(self, generator, run, max_pending):
+        self._generator = generator
+        self._generation = run
+        self._queue = queue.Queue(maxsize=max(1, max_pending))
+        self._error = None
+        self._aborted = False
+        self._thread = threading.Thread(target=self._run, name="finish", daemon=True)
+        self._thread.start()
+
+    def put(self, pending_item):
+        """
+        Envia uma NFT para a finalização; bloqueia enquanto a fila estiver cheia.
+        """
+        self._raise_error()
+        self._queue.put(pending_item)
+
+    def drain(self):
+        """
+        Espera a finalização de tudo o que foi enviado.
+        """
+        self._queue.join()
+        self._raise_error()
+
+    def abort(self):
+        """
+        Cancela as NFTs que ainda não começaram a ser renderizadas.
+        """
+        self._aborted = True
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        while True:
+            pending_item = self._queue.get()
+            try:
+                if pending_item is None:
+                    return
+                if self._error is not None or self._aborted:
+                    # Apenas esvazia a fila para não travar quem está enviando
+                    if pending_item[0] is not None:
+                        pending_item[0].cancel()
+                    continue
+                self._generator._finish_pending(pending_item, self._generation)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
 
 class NFTGenerator:
     rarity_probabilities = {
@@ -15,10 +164,40 @@ class NFTGenerator:
         "Exotic": 0.02,
     }
 
-    def __init__(self):
-        self.generated_combinations = set()  # Armazena combinações únicas
+    def __init__(self, layer_cache=None, composite_cache=None, asset_index=None, asset_pack=None,
+                 image_uri=DEFAULT_IMAGE_URI):
+        """
+        Args:
+            layer_cache (LayerCache): Cache de camadas decodificadas.
+            composite_cache (PrefixCompositeCache): Cache de composições parciais, usado com
+                ``render_order="prefix"``.
+            asset_index (AssetIndex): Índice persistente dos arquivos de camadas.
+            asset_pack (str): Pacote de camadas criado por ``build_asset_pack`` (caminho ou
+                AssetPack); as camadas do pacote são lidas do mapeamento em vez de decodificadas.
+            image_uri (str): Modelo do campo "image" dos metadados, com ``{id}``, ``{sha256}`` e
+                ``{cid}`` (ver ``format_image_uri``), por exemplo ``ipfs://{cid}``. O hash é o da
+                saída principal, calculado na codificação, sem reler as imagens.
+        """
+        self.image_uri = image_uri
+        self.generated_combinations = CombinationSet()  # Armazena combinações únicas
+        # Índice persistente dos arquivos de camadas (listagem, dimensões e modo)
+        self.asset_index = asset_index if asset_index is not None else AssetIndex()
+        # Cache de camadas decodificadas compartilhado entre as gerações
+        self.layer_cache = layer_cache if layer_cache is not None else LayerCache()
+        # Cache de composições parciais (prefixos de camadas) compartilhado entre as gerações
+        self.composite_cache = composite_cache if composite_cache is not None else PrefixCompositeCache()
+        if isinstance(asset_pack, str):
+            asset_pack = AssetPack(asset_pack, fallback=self.layer_cache)
+        if asset_pack is not None and asset_pack.stale:
+            print(f"Aviso: {len(asset_pack.stale)} camadas mudaram desde a criação do pacote '{asset_pack.path}' "
+                  f"e serão lidas do disco; reconstrua o pacote com asset_pack.py.")
+        self.asset_pack = asset_pack
 
-    def generate(self, layers, output_dir, max_nfts=None, image_format="png", callback=None, rarities=None):
+    def generate(self, layers, output_dir, max_nfts=None, image_format="png", callback=None, rarities=None,
+                 workers=1, render_order="id", resume=False, seed=None, pretty_metadata=True,
+                 metadata_jsonl=False, outputs=None, encode_workers=2, preview_callback=None, stats=None,
+                 verbose=True, rarity_ranking=True, shard_size=None, rules=None,
+                 plan_file=None, shard=None, archive=None, job=None):
         """
         Gera NFTs com base nas camadas, raridades selecionadas e outros parâmetros.
 
@@ -26,100 +205,700 @@ class NFTGenerator:
             layers (list): Lista de camadas com caminhos e itens.
             output_dir (str): Diretório de saída para imagens e metadados.
             max_nfts (int): Quantidade máxima de NFTs a serem geradas.
-            image_format (str): Formato de saída das imagens ("png", "jpg", etc).
+            image_format (str): Formato de saída das imagens ("png", "jpg", etc), usado quando
+                ``outputs`` não é informado.
             callback (function): Função de callback para cada imagem gerada.
             rarities (set): Conjunto de raridades selecionadas pelo usuário.
+            workers (int): Número de processos usados para compor e salvar as imagens.
+                Com mais de um processo a seleção das combinações continua sequencial,
+                então IDs, arquivos e metadados são os mesmos de uma execução serial.
+            render_order (str): "id" renderiza na ordem dos IDs; "prefix" agrupa as NFTs que
+                compartilham as camadas inferiores para reaproveitar as composições parciais;
+                só esta ordem usa o cache de composições, que na ordem de ID quase nunca acerta.
+                Cada NFT continua salva com o seu ID e o CSV continua em ordem de ID, mas
+                o callback passa a ser chamado na ordem de renderização.
+            resume (bool): Retoma uma geração interrompida a partir do diário gravado em
+                ``output_dir``: refaz o plano com a mesma semente, pula os IDs já
+                concluídos e reconstrói o conjunto de unicidade e o CSV sem renderizar de novo.
+            seed (int): Semente da geração. A combinação e a decisão de NFT especial de cada
+                ID dependem só da semente e do ID, então a mesma semente reproduz a coleção
+                e ``render_token`` refaz uma NFT isolada. Uma semente aleatória é usada se omitida.
+            pretty_metadata (bool): Indenta os JSON de metadados; False grava em formato compacto.
+            metadata_jsonl (bool): Também grava todos os metadados em ``metadata.jsonl``.
+            outputs (list): Saídas de imagem geradas a partir de uma única composição, por exemplo
+                ``["png@full:c1", "webp@1024:q85", "jpg@256"]`` (ver ``OutputSpec``). A primeira
+                vai para ``nfts/`` e é a usada no diário e no callback.
+            encode_workers (int): Threads da etapa de codificação no modo serial; 0 codifica
+                na mesma thread da composição. Com ``workers`` > 1 cada processo codifica
+                as próprias NFTs.
+            preview_callback (function): Recebe a imagem composta em memória de cada NFT, para
+                pré-visualização sem reabrir o arquivo. A imagem é compartilhada com os caches e
+                não deve ser alterada. Não é chamado com ``workers`` > 1, pois a composição
+                acontece em outros processos.
+            stats (GenerationStats): Instrumentação da geração, com os ganchos de eventos;
+                uma nova é criada se omitida.
+            verbose (bool): Imprime uma linha por NFT; False mantém o terminal em silêncio.
+            rarity_ranking (bool): Calcula o ranking de raridade da coleção pela frequência dos
+                traços. Os metadados e o CSV são gravados sem o ranking à medida que as NFTs ficam
+                prontas e regravados no final com ``rarity_score`` e ``rarity_rank``; o estado do
+                ranking fica em ``rarity.json`` (ver ``RarityEngine``). Uma geração interrompida ou
+                cancelada fica com os metadados das NFTs concluídas, sem o ranking.
+            shard_size (int): Modo de coleções grandes: imagens e JSON de metadados são distribuídos
+                em subdiretórios de ``shard_size`` NFTs (por exemplo ``nfts/0001/NFT_1234.png``
+                com 1000). A memória e o tempo por NFT não crescem com a coleção.
+            rules (TraitRules | str): Regras de compatibilidade entre traços, ou o caminho do
+                arquivo JSON de regras (ver ``TraitRules``). Nenhuma NFT, comum ou especial,
+                viola as regras, e a viabilidade considera só as combinações permitidas.
+            plan_file (str): Arquivo de plano criado por ``write_plan``. A quantidade, a semente, as
+                raridades e as regras vêm do plano, e as combinações não são sorteadas de novo.
+            shard (tuple): ``(k, n)`` renderiza só a parte k (a partir de 1) de n faixas contíguas
+                de IDs do ``plan_file``. Várias partes podem rodar ao mesmo tempo no mesmo
+                diretório de saída (ou em máquinas diferentes); o diário e o CSV de cada parte
+                ficam em ``shards/`` e o ranking de raridade é feito por ``merge_shards``.
+            archive (str): Grava as imagens e os JSON de metadados direto neste pacote (``.zip``,
+                ``.tar``, ``.tar.gz``), com os mesmos caminhos de ``nfts/`` e ``metadata/``, em vez
+                de arquivos soltos; um caminho relativo fica dentro de ``output_dir``. O CSV, o
+                ``metadata.jsonl`` e o ``rarity.json`` ficam em ``output_dir`` e também entram
+                no pacote. O caminho passado ao callback não existe no disco nesse modo.
+                Não pode ser combinado com ``resume`` nem com ``plan_file``.
+            job (GenerationJob): Controle de pausa e cancelamento, preenchido por ``start``.
+                Cancelada, a geração conclui as NFTs em andamento, fecha o diário e o CSV e
+                não calcula o ranking; o resumo traz ``"cancelled": True``.
+
+        Returns:
+            GenerationStats: Tempo por etapa, vazão, novas tentativas e caches da geração.
         """
+        stats = stats if stats is not None else GenerationStats()
+        if isinstance(rules, str):
+            rules = TraitRules.load(rules)
+        if shard is not None and plan_file is None:
+            raise ValueError("Renderizar uma parte da coleção exige um arquivo de plano.")
+        if archive is not None and (resume or plan_file is not None):
+            raise ValueError("A geração em pacote não pode ser retomada nem dividida em partes.")
+        if plan_file is not None:
+            plan_header = read_plan_header(plan_file)
+            if max_nfts is not None and max_nfts != plan_header["max_nfts"]:
+                raise ValueError(f"O arquivo de plano tem {plan_header['max_nfts']} NFTs, não {max_nfts}.")
+            if seed is not None and seed != plan_header["seed"]:
+                raise ValueError("A semente informada não é a do arquivo de plano.")
+            max_nfts, seed = plan_header["max_nfts"], plan_header["seed"]
+            rarities = set(plan_header["rarities"]) if plan_header["rarities"] else None
+            rules = TraitRules(plan_header["rules"]) if plan_header["rules"] else None
+        # Com uma parte da coleção o diário e o CSV ficam no diretório da parte
+        run_dir = output_dir if shard is None else shard_directory(output_dir, *shard)
+        os.makedirs(run_dir, exist_ok=True)
         image_output_dir = os.path.join(output_dir, "nfts")
         metadata_output_dir = os.path.join(output_dir, "metadata")
-        os.makedirs(image_output_dir, exist_ok=True)
-        os.makedirs(metadata_output_dir, exist_ok=True)
+        if archive is None:
+            os.makedirs(image_output_dir, exist_ok=True)
+            os.makedirs(metadata_output_dir, exist_ok=True)
 
         # Carrega os arquivos das camadas com base nas raridades escolhidas
         layer_files = self.load_layer_files_with_rarity(layers, rarities)
 
-        nft_id = 1
-        metadata_list = []  # Para coletar todos os metadados para o CSV
-        special_rarities = list(self.rarity_probabilities.keys())  # Raridades disponíveis para geração especial
-        next_special_nft = random.randint(5, 15)  # Número aleatório para a primeira NFT especial
-
-        while nft_id <= max_nfts:
-            # Verifica se é hora de gerar uma NFT especial
-            is_special = nft_id == next_special_nft
-            
-            if is_special:
-                special_rarity = random.choice(special_rarities)  # Escolhe uma raridade especial
-                print(f"Gerando NFT especial com raridade '{special_rarity}'!")
-                combination = [
-                    random.choice(layer_files[layer][special_rarity])
-                    for layer in range(len(layer_files))
-                    if special_rarity in layer_files[layer]
-                ]
-                # Define o próximo NFT especial de forma aleatória
-                next_special_nft = nft_id + random.randint(5, 15)
+        outputs = outputs or [image_format]
+        parallel = workers is not None and workers > 1
+        archive_writer = ArchiveWriter(os.path.join(output_dir, archive)) if archive is not None else None
+        encoder = ImageEncoder(outputs, image_output_dir, workers=0 if parallel else encode_workers, stats=stats,
+                               shard_size=shard_size, archive=archive_writer)
+
+        settings = {
+            "max_nfts": max_nfts,
+            "outputs": [spec.text for spec in encoder.outputs],
+            "layers": [[layer["name"], layer["path"]] for layer in layers],
+            "rarities": sorted(rarities) if rarities else None,
+            "shard_size": shard_size or None,
+            "rules": rules.to_dict()["rules"] if rules else None,
+            "plan": plan_digest(plan_file) if plan_file is not None else None,
+            "shard": list(shard) if shard is not None else None,
+            "image_uri": self.image_uri if self.image_uri != DEFAULT_IMAGE_URI else None,
+        }
+        journal = GenerationJournal(run_dir)
+        resuming = resume and journal.exists()
+        if resuming:
+            header = journal.read_header()
+            if {key: header.get(key) for key in settings} != settings:
+                raise ValueError("Os parâmetros da geração não correspondem ao diário existente; não é possível retomar.")
+            seed = header["seed"]
+            # O plano é refeito sobre as mesmas combinações anteriores da geração original
+            previous = header["previous_combinations"]
+            self.generated_combinations = (CombinationSet.load(os.path.join(run_dir, previous)) if previous
+                                           else CombinationSet())
+        else:
+            if seed is None:
+                seed = secrets.randbits(63)
+            # As combinações anteriores vão para um arquivo à parte: o cabeçalho não cresce com elas
+            previous_path = os.path.join(run_dir, PREVIOUS_COMBINATIONS_FILENAME)
+            previous = None
+            if len(self.generated_combinations):
+                self.generated_combinations.save(previous_path)
+                previous = PREVIOUS_COMBINATIONS_FILENAME
+            elif os.path.isfile(previous_path):
+                os.remove(previous_path)
+            journal.start({
+                **settings,
+                "seed": seed,
+                "previous_combinations": previous,
+            })
+
+        stats.start(max_nfts=max_nfts, seed=seed)
+
+        # Planeja todas as combinações antes de renderizar qualquer pixel
+        with stats.timed("selection"):
+            if plan_file is not None:
+                plan = load_plan(plan_file, CombinationPlanner(layer_files, self.rarity_probabilities, seed=seed))
             else:
-                # Gera uma combinação aleatória e única
-                combination = None
-                combination_tuple = None
-                attempt_count = 0
-                while combination_tuple is None or combination_tuple in self.generated_combinations:
-                    if attempt_count > 100:
-                        raise ValueError("Não foi possível gerar uma combinação única após 100 tentativas.")
-                    combination = [self.select_random_item_with_rarity(layer) for layer in layer_files]
-                    # Converte a combinação para uma tupla hashável
-                    combination_tuple = tuple((item["name"], item["rarity"], item["file"]) for item in combination)
-                    attempt_count += 1
-
-                # Registra a combinação como única
-                self.generated_combinations.add(combination_tuple)
-
-            # Define o caminho de saída para a imagem e o metadata
-            output_path = os.path.join(image_output_dir, f"NFT_{nft_id}.{image_format}")
-            metadata_path = os.path.join(metadata_output_dir, f"NFT_{nft_id}.json")
-
-            # Cria a imagem NFT
-            create_nft_image(combination, output_path)
-
-            # Gera metadados no formato ERC-1155 (sem o campo "decimals")
-            metadata = self.create_metadata(nft_id, combination)
-
-            # Escreve o JSON do metadata individualmente
-            with open(metadata_path, "w") as f:
-                json.dump(metadata, f, indent=4)
-
-            metadata_list.append(metadata)  # Adiciona à lista de metadados para o CSV
-
-            # Log da geração de cada NFT no terminal
-            print(f"NFT {nft_id} gerada: {metadata['name']} com atributos: {metadata['attributes']}")
+                plan = self.plan(layer_files, max_nfts, seed=seed, rules=rules)
+        stats.retries += plan.planner.retries
+        stats.extra["plan"] = plan.summary()
+        stats.extra["seed"] = seed
+        if verbose:
+            print(f"Plano de geração (semente {seed}): {plan.summary()}")
+
+        # NFTs já concluídas, por ID; o diário é lido linha a linha, sem guardar os registros
+        completed = np.zeros(len(plan) + 1, dtype=bool)
+        # Hashes das imagens, só quando o campo "image" depende deles
+        digests = ContentDigests(len(plan)) if uses_content_hash(self.image_uri) else None
+        if resuming:
+            for entry in journal.iter_tokens():
+                nft_id = entry["id"]
+                keys = [[item["name"], item["rarity"], item["file"]] for item in plan.combination(nft_id - 1)]
+                if entry["combination"] != keys:
+                    raise ValueError(f"A NFT {nft_id} do diário não corresponde ao plano refeito; não é possível retomar.")
+                # Uma imagem ausente no disco é renderizada de novo
+                completed[nft_id] = all(os.path.isfile(path) for path in encoder.paths(nft_id))
+                if digests is not None and entry.get("sha256"):
+                    digests.set(nft_id, entry["sha256"])
+            journal.open()
+            if verbose:
+                print(f"Retomando geração: {int(completed.sum())} NFTs já concluídas.")
+
+        start, end = (0, len(plan)) if shard is None else shard_range(len(plan), *shard)
+        if render_order == "prefix":
+            order = [row for row in prefix_order(plan) if start <= row < end]
+        elif render_order == "id":
+            order = range(start, end)
+        else:
+            raise ValueError(f"Ordem de renderização inválida: '{render_order}'.")
+        # Na ordem de ID os prefixos raramente se repetem em sequência, e guardar cada um
+        # custaria mais do que compor a NFT inteira
+        composite_cache = self.composite_cache if render_order == "prefix" else None
+        # NFTs a renderizar nesta execução, informado nos eventos de progresso
+        stats.total = (end - start) - int(completed[start + 1:end + 1].sum())
+
+        # Uma parte da coleção não conhece as frequências das outras: o ranking fica para merge_shards
+        rarity_ranking = rarity_ranking and shard is None
+        # Os JSON e o CSV são gravados à medida que as NFTs ficam prontas, então uma queda
+        # deixa os metadados de cada NFT do diário. Com o ranking o CSV é regravado em ordem
+        # de ID no final, e esta passada não precisa reter as linhas que chegam fora de ordem
+        metadata_writer = MetadataWriter(run_dir, metadata_dir=metadata_output_dir,
+                                         pretty=pretty_metadata, jsonl=metadata_jsonl, stats=stats,
+                                         shard_size=shard_size, ordered=render_order == "id" or not rarity_ranking,
+                                         first_id=start + 1, archive=archive_writer,
+                                         # No pacote os JSON entram uma única vez, já com o ranking
+                                         json_files=archive_writer is None or not rarity_ranking)
+        rarity = RarityEngine() if rarity_ranking else None
+        run = _GenerationRun(metadata_writer, journal, rarity, callback, stats, verbose, archive_writer, digests)
+        pool = self._create_render_pool(workers, encoder.outputs, image_output_dir, shard_size,
+                                        collect=archive_writer is not None,
+                                        reuse_prefixes=composite_cache is not None) if parallel else None
+        # NFTs em andamento antes de a composição esperar pela finalização das mais antigas
+        max_pending = 2 * (workers if parallel else encode_workers)
+        finisher = _FinishStage(self, run, max_pending)
+        cancelled = False
+        try:
+            try:
+                for row in order:
+                    if job is not None and not job.checkpoint(drain=finisher.drain):
+                        cancelled = True
+                        break
+                    nft_id = int(row) + 1
+                    combination = plan.combination(nft_id - 1)
+                    if completed[nft_id]:
+                        # NFT já renderizada: a finalização só refaz os metadados para o CSV
+                        finisher.put((None, nft_id, combination, None))
+                        continue
+                    special_rarity = plan.special_rarity(nft_id - 1)
+                    if special_rarity and verbose:
+                        print(f"Gerando NFT especial com raridade '{special_rarity}'!")
+
+                    # Define o caminho de saída principal da imagem
+                    output_path = encoder.paths(nft_id)[0]
+
+                    if pool is None:
+                        # Compõe a NFT aqui e envia a imagem para a etapa de codificação
+                        image = _compose_measured(combination, self.layer_source, composite_cache, stats)
+                        future = encoder.submit(image, nft_id)
+                        if preview_callback:
+                            preview_callback(image)
+                    else:
+                        future = pool.submit(_render_nft_worker, combination, nft_id)
+                    # Bloqueia enquanto a fila da finalização estiver cheia
+                    finisher.put((future, nft_id, combination, output_path))
+
+                # Espera as NFTs em andamento, também ao cancelar, para a saída parcial ficar consistente
+                finisher.drain()
+            except BaseException:
+                # Cancela o que ainda não começou para não deixar o pool pendurado
+                finisher.abort()
+                raise
+            finally:
+                finisher.close()
+                if pool is not None:
+                    pool.shutdown(wait=True, cancel_futures=True)
+                encoder.close(cancel=True)
+                metadata_writer.close()
+                journal.close()
+
+            if rarity is not None and not cancelled:
+                self.write_ranked_metadata(output_dir, rarity, pretty_metadata=pretty_metadata,
+                                           metadata_jsonl=metadata_jsonl, stats=stats, shard_size=shard_size,
+                                           digests=digests, archive=archive_writer)
+                rarity.save(os.path.join(output_dir, RARITY_FILENAME))
+            elif rarity is not None and archive_writer is not None:
+                # Geração cancelada: os JSON que esperavam o ranking entram no pacote sem ele
+                ids, _, _ = rarity.rank()
+                with MetadataWriter(output_dir, pretty=pretty_metadata, jsonl=metadata_jsonl, stats=stats,
+                                    shard_size=shard_size, archive=archive_writer) as writer:
+                    for nft_id in ids.tolist():
+                        checksum = digests.get(nft_id) if digests is not None else None
+                        writer.write(nft_id, self.create_metadata(nft_id, rarity.combination(nft_id), checksum))
+            if archive_writer is not None:
+                # O CSV e o ranking também vão para o pacote, que fica completo
+                ranked = rarity_ranking and not cancelled
+                names = ["metadata.csv"] + ["metadata.jsonl"] * metadata_jsonl + [RARITY_FILENAME] * ranked
+                for name in names:
+                    archive_writer.add_file(os.path.join(output_dir, name), name)
+        finally:
+            if archive_writer is not None:
+                archive_writer.close()
+
+        # Com processos, os caches usados ficam em cada processo do pool
+        caches = {} if parallel else {"layer_cache": self.layer_cache}
+        if composite_cache is not None and not parallel:
+            caches["composite_cache"] = composite_cache
+        if self.asset_pack is not None and not parallel:
+            caches["asset_pack"] = self.asset_pack
+        if cancelled:
+            stats.extra["cancelled"] = True
+        stats.finish(**caches)
+        if verbose and cancelled:
+            print(f"Geração cancelada: {stats.tokens} NFTs concluídas.")
+        elif verbose:
+            summary = stats.summary()
+            print(f"Geração de NFTs concluída: {summary['tokens']} NFTs em {summary['wall_seconds']:.1f}s "
+                  f"({summary['tokens_per_sec']:.1f} NFTs/s).")
+        return stats
+
+    def start(self, layers, output_dir, stats=None, **options):
+        """
+        Inicia ``generate`` em segundo plano e retorna o controle da geração.
+
+        Args:
+            layers (list): Lista de camadas com caminhos e itens.
+            output_dir (str): Diretório de saída para imagens e metadados.
+            stats (GenerationStats): Instrumentação da geração; uma nova é criada se omitida.
+            **options: Demais parâmetros de ``generate``.
+
+        Returns:
+            GenerationJob: Geração em andamento, com ``pause``, ``resume``, ``cancel`` e ``result``.
+        """
+        stats = stats if stats is not None else GenerationStats()
+        return GenerationJob(stats).run(self.generate, layers, output_dir, stats=stats, **options)
+
+    def plan(self, layer_files, max_nfts, seed=0, rules=None):
+        """
+        Planeja as combinações de todas as NFTs de uma vez.
+
+        As combinações comuns são sorteadas em lote, únicas entre si e em relação a
+        ``generated_combinations``, que é atualizado com as novas combinações.
+
+        Args:
+            layer_files (list): Arquivos das camadas filtrados por raridade.
+            max_nfts (int): Quantidade de NFTs.
+            seed (int): Semente da geração.
+            rules (TraitRules): Regras de compatibilidade entre traços.
+
+        Returns:
+            CombinationPlan: Plano com uma linha por NFT, na ordem dos IDs.
+        """
+        planner = CombinationPlanner(layer_files, self.rarity_probabilities, seed=seed, rules=rules)
+        feasibility = planner.feasibility(max_nfts)
+        if not feasibility["feasible"]:
+            estimated = "" if feasibility["exact"] else " (estimativa)"
+            print(f"Aviso: {max_nfts} NFTs excedem as {feasibility['valid_combinations']} combinações "
+                  f"permitidas{estimated}; a geração só será viável se houver NFTs especiais suficientes.")
+
+        plan = planner.plan(max_nfts, exclude=self.generated_combinations.codes(planner))
+        # Registra as combinações como únicas
+        self.generated_combinations.add_plan(plan, np.flatnonzero(plan.special < 0))
+        return plan
+
+    def write_plan(self, layers, plan_path, max_nfts, rarities=None, seed=None, rules=None):
+        """
+        Planeja a coleção inteira e grava a combinação de cada ID em um arquivo de plano.
+
+        O arquivo é a referência comum das partes renderizadas com ``generate(plan_file=...,
+        shard=(k, n))``, em um ou mais computadores: como nenhuma parte sorteia combinações,
+        a unicidade vale para a coleção inteira.
+
+        Args:
+            layers (list): Lista de camadas com caminhos e itens.
+            plan_path (str): Arquivo de plano a ser criado.
+            max_nfts (int): Quantidade de NFTs.
+            rarities (set): Conjunto de raridades selecionadas.
+            seed (int): Semente da geração; aleatória se omitida.
+            rules (TraitRules | str): Regras de compatibilidade entre traços.
+
+        Returns:
+            CombinationPlan: Plano gravado.
+        """
+        if isinstance(rules, str):
+            rules = TraitRules.load(rules)
+        if seed is None:
+            seed = secrets.randbits(63)
+        layer_files = self.load_layer_files_with_rarity(layers, rarities)
+        plan = self.plan(layer_files, max_nfts, seed=seed, rules=rules)
+        save_plan(plan, plan_path, {
+            "seed": seed,
+            "max_nfts": max_nfts,
+            "rarities": sorted(rarities) if rarities else None,
+            "rules": rules.to_dict()["rules"] if rules else None,
+        })
+        return plan
+
+    def render_token(self, seed, token_id, layers, output_dir, image_format=None, rarities=None, outputs=None,
+                     shard_size=None, rules=None):
+        """
+        Refaz uma única NFT de uma geração, sem renderizar as anteriores.
+
+        A combinação do ID é derivada da semente e do ID; apenas as combinações dos IDs
+        anteriores são recalculadas (em lote, sem imagens) para resolver as repetições
+        da mesma forma que ``generate``. O custo é O(token_id), não O(1): refazer a NFT
+        1.000.000 replaneja um milhão de combinações, cerca de 6,5 s de planejamento.
+        O CSV da coleção não é alterado.
+
+        Os parâmetros da geração original (semente, saídas, subdiretórios, regras, raridades,
+        modelo do campo "image" e as combinações de gerações anteriores, que o plano exclui)
+        são lidos do diário em ``output_dir``; os argumentos só são necessários sem o diário
+        e, se informados, precisam ser iguais aos do diário.
+
+        Args:
+            seed (int): Semente usada na geração original; None usa a do diário.
+            token_id (int): ID da NFT a refazer.
+            layers (list): Lista de camadas com caminhos e itens.
+            output_dir (str): Diretório de saída da geração original.
+            image_format (str): Formato de saída da imagem, quando ``outputs`` não é informado.
+            rarities (set): Conjunto de raridades selecionadas na geração original.
+            outputs (list): Saídas de imagem da geração original (ver ``generate``).
+            shard_size (int): NFTs por subdiretório da geração original.
+            rules (TraitRules | str): Regras de compatibilidade da geração original.
+
+        Returns:
+            dict: Metadados da NFT.
+
+        Raises:
+            ValueError: Se os argumentos são diferentes dos parâmetros gravados no diário,
+                ou se não há diário e a semente não foi informada.
+        """
+        if isinstance(rules, str):
+            rules = TraitRules.load(rules)
+        given = {
+            "seed": seed,
+            "layers": [[layer["name"], layer["path"]] for layer in layers],
+            "outputs": [OutputSpec.parse(spec).text for spec in outputs or [image_format]]
+                       if outputs or image_format else None,
+            "rarities": sorted(rarities) if rarities else None,
+            "shard_size": shard_size or None,
+            "rules": rules.to_dict()["rules"] if rules else None,
+            "image_uri": self.image_uri if self.image_uri != DEFAULT_IMAGE_URI else None,
+        }
+        journal = GenerationJournal(output_dir)
+        previous = None
+        if journal.exists():
+            header = journal.read_header()
+            if header.get("plan"):
+                raise ValueError("A geração usou um arquivo de plano: as combinações vêm do plano, não da semente.")
+            recorded = {
+                "seed": header["seed"],
+                "layers": header["layers"],
+                "outputs": [OutputSpec.parse(spec).text for spec in header["outputs"]],
+                "rarities": header["rarities"],
+                "shard_size": header["shard_size"],
+                "rules": header["rules"],
+                "image_uri": header.get("image_uri"),
+            }
+            conflicts = [key for key, value in given.items()
+                         if key != "layers" and value is not None and value != recorded[key]]
+            if given["layers"] != recorded["layers"]:
+                conflicts.insert(0, "layers")
+            if conflicts:
+                raise ValueError(f"Parâmetros diferentes dos da geração original em {journal.path}: "
+                                 f"{', '.join(conflicts)}.")
+            if token_id > header["max_nfts"]:
+                raise ValueError(f"A geração original tem apenas {header['max_nfts']} NFTs.")
+            given = recorded
+            if header.get("previous_combinations"):
+                previous = CombinationSet.load(os.path.join(output_dir, header["previous_combinations"]))
+        elif seed is None:
+            raise ValueError(f"Sem diário de geração em {output_dir}: informe a semente da geração original.")
+        seed, outputs, shard_size = given["seed"], given["outputs"] or ["png"], given["shard_size"]
+        rarities = set(given["rarities"]) if given["rarities"] else None
+        rules = TraitRules(given["rules"]) if given["rules"] else None
+        image_uri = given["image_uri"] or DEFAULT_IMAGE_URI
+
+        image_output_dir = os.path.join(output_dir, "nfts")
+        metadata_output_dir = os.path.join(output_dir, "metadata")
+        os.makedirs(image_output_dir, exist_ok=True)
+        os.makedirs(metadata_output_dir, exist_ok=True)
+
+        layer_files = self.load_layer_files_with_rarity(layers, rarities)
+        planner = CombinationPlanner(layer_files, self.rarity_probabilities, seed=seed, rules=rules)
+        # As combinações das gerações anteriores do mesmo NFTGenerator foram excluídas do plano original
+        plan = planner.plan(token_id, exclude=previous.codes(planner) if previous is not None else None)
+        combination = plan.combination(token_id - 1)
+
+        encoder = ImageEncoder(outputs, image_output_dir, workers=0, shard_size=shard_size)
+        checksum = encoder.encode(compose_layers(combination, cache=self.layer_source), token_id)
+
+        metadata = self.create_metadata(token_id, combination, checksum, image_uri=image_uri)
+        rarity_path = os.path.join(output_dir, RARITY_FILENAME)
+        if os.path.isfile(rarity_path):
+            # Mantém o ranking da coleção nos metadados refeitos
+            rarity = RarityEngine.load(rarity_path)
+            rarity.add(token_id, combination)
+            ids, scores, ranks = rarity.rank()
+            row = int(np.searchsorted(ids, token_id))
+            self._add_rarity_fields(metadata, scores[row], ranks[row])
+        metadata_path = ShardedLayout(shard_size).path(metadata_output_dir, token_id, f"NFT_{token_id}.json", create=True)
+        with open(metadata_path, "w") as f:
+            json.dump(metadata, f, indent=4)
+        return metadata
+
+    def write_ranked_metadata(self, output_dir, rarity, pretty_metadata=True, metadata_jsonl=False, stats=None,
+                              shard_size=None, digests=None, archive=None, image_uri=None):
+        """
+        Regrava os metadados e o CSV de todas as NFTs do ranking com escore e posição de raridade.
+
+        Os metadados são refeitos a partir das combinações guardadas no ranking, sem ler
+        os JSON existentes. Para acrescentar NFTs a uma coleção, carregue o ``rarity.json``
+        com ``RarityEngine.load``, adicione as NFTs e chame este método.
 
-            if callback:
-                callback(output_path)
+        Args:
+            output_dir (str): Diretório de saída da coleção.
+            rarity (RarityEngine): Ranking com todas as NFTs da coleção.
+            pretty_metadata (bool): Indenta os JSON de metadados.
+            metadata_jsonl (bool): Também grava ``metadata.jsonl``.
+            stats (GenerationStats): Instrumentação opcional.
+            shard_size (int): NFTs por subdiretório da geração original (ver ``generate``).
+            digests (ContentDigests): Hashes das imagens, exigidos quando ``image_uri`` usa o hash.
+            archive (ArchiveWriter): Grava os JSON no pacote em vez de arquivos soltos.
+            image_uri (str): Modelo do campo "image"; ``self.image_uri`` se omitido.
+        """
+        ids, scores, ranks = rarity.rank()
+        # O CSV anterior só é substituído depois de regravado por inteiro
+        with MetadataWriter(output_dir, pretty=pretty_metadata, jsonl=metadata_jsonl, stats=stats,
+                            shard_size=shard_size, archive=archive, atomic=True) as writer:
+            for nft_id, score, rank in zip(ids.tolist(), scores.tolist(), ranks.tolist()):
+                checksum = digests.get(nft_id) if digests is not None else None
+                metadata = self.create_metadata(nft_id, rarity.combination(nft_id), checksum, image_uri=image_uri)
+                self._add_rarity_fields(metadata, score, rank)
+                writer.write(nft_id, metadata)
+
+    def merge_shards(self, layers, output_dir, plan_file, pretty_metadata=True, metadata_jsonl=False,
+                     rarity_ranking=True):
+        """
+        Junta as partes renderizadas com ``generate(plan_file=..., shard=(k, n))`` em uma coleção.
+
+        Confere, pelos diários das partes, que todas as partes existem e usaram o mesmo
+        plano, que cada ID foi renderizado exatamente uma vez com a combinação do plano e
+        que as imagens e os JSON estão no diretório de saída. O campo "image" usa o modelo
+        gravado nos diários das partes, que precisa ser o mesmo em todas. Depois grava o
+        ``metadata.csv`` da coleção em ordem de ID e, com ``rarity_ranking``, o ranking de
+        raridade (nos JSON, no CSV e em ``rarity.json``).
+
+        Args:
+            layers (list): Lista de camadas com caminhos e itens.
+            output_dir (str): Diretório de saída comum às partes.
+            plan_file (str): Arquivo de plano usado pelas partes.
+            pretty_metadata (bool): Indenta os JSON de metadados.
+            metadata_jsonl (bool): Também grava ``metadata.jsonl``.
+            rarity_ranking (bool): Calcula o ranking de raridade da coleção.
+
+        Returns:
+            dict: Quantidade de NFTs e de partes.
+
+        Raises:
+            ValueError: Se falta alguma parte ou NFT, se alguma NFT está repetida ou
+                não corresponde ao plano, ou se as partes usaram modelos de "image" diferentes.
+        """
+        header = read_plan_header(plan_file)
+        layer_files = self.load_layer_files_with_rarity(layers, set(header["rarities"]) if header["rarities"] else None)
+        plan = load_plan(plan_file, CombinationPlanner(layer_files, self.rarity_probabilities, seed=header["seed"]))
+        regular = plan.codes[plan.special < 0]
+        if len(np.unique(regular)) != len(regular):
+            raise ValueError("O arquivo de plano tem combinações repetidas.")
+
+        shards = find_shards(output_dir)
+        counts = {count for _, count, _ in shards}
+        if len(counts) != 1 or sorted(shard for shard, _, _ in shards) != list(range(1, counts.pop() + 1)):
+            raise ValueError(f"Partes incompletas em {output_dir}: {[shard for shard, _, _ in shards]}.")
+
+        journals = [GenerationJournal(directory) for _, _, directory in shards]
+        shard_headers = [journal.read_header() for journal in journals]
+        # Os JSON já gravados pelas partes usam o modelo de cada parte, não o deste NFTGenerator
+        templates = {shard_header.get("image_uri") for shard_header in shard_headers}
+        if len(templates) > 1:
+            raise ValueError(f"As partes usaram modelos diferentes para o campo \"image\": "
+                             f"{sorted(template or DEFAULT_IMAGE_URI for template in templates)}.")
+        image_uri = templates.pop() or DEFAULT_IMAGE_URI
+
+        digest = plan_digest(plan_file)
+        seen = np.zeros(len(plan) + 1, dtype=np.int64)
+        digests = ContentDigests(len(plan)) if uses_content_hash(image_uri) else None
+        problems = []
+        shard_size = None
+        for (shard, count, _), journal, shard_header in zip(shards, journals, shard_headers):
+            if shard_header.get("plan") != digest:
+                raise ValueError(f"A parte {shard} de {count} foi renderizada com outro arquivo de plano.")
+            shard_size = shard_header["shard_size"]
+            encoder = ImageEncoder(shard_header["outputs"], os.path.join(output_dir, "nfts"), workers=0,
+                                   shard_size=shard_size)
+            metadata_layout = ShardedLayout(shard_size)
+            start, end = shard_range(len(plan), shard, count)
+            # Uma NFT renderizada de novo ao retomar a parte aparece mais de uma vez no mesmo diário
+            present = np.zeros(len(plan) + 1, dtype=bool)
+            for entry in journal.iter_tokens():
+                nft_id = entry["id"]
+                if not start < nft_id <= end:
+                    problems.append(f"NFT {nft_id} fora da parte {shard}")
+                    continue
+                present[nft_id] = True
+                if digests is not None:
+                    digests.set(nft_id, entry["sha256"])
+                # As camadas podem estar em outro caminho em cada máquina: compara raridade e arquivo
+                expected = [[item["name"], item["rarity"], os.path.basename(item["file"])]
+                            for item in plan.combination(nft_id - 1)]
+                recorded = [[name, rarity, os.path.basename(file)] for name, rarity, file in entry["combination"]]
+                if recorded != expected:
+                    problems.append(f"NFT {nft_id} diferente do plano")
+                metadata_path = metadata_layout.path(os.path.join(output_dir, "metadata"), nft_id, f"NFT_{nft_id}.json")
+                if not all(os.path.isfile(path) for path in encoder.paths(nft_id) + [metadata_path]):
+                    problems.append(f"NFT {nft_id} sem arquivos")
+            encoder.close()
+            seen += present
+
+        missing = np.flatnonzero(seen[1:] == 0) + 1
+        duplicated = np.flatnonzero(seen[1:] > 1) + 1
+        if len(missing):
+            problems.append(f"{len(missing)} NFTs ausentes (por exemplo {missing[:5].tolist()})")
+        if len(duplicated):
+            problems.append(f"{len(duplicated)} NFTs repetidas (por exemplo {duplicated[:5].tolist()})")
+        if problems:
+            raise ValueError("Não foi possível juntar as partes: " + "; ".join(problems[:10]))
 
-            nft_id += 1
+        if rarity_ranking:
+            rarity = RarityEngine()
+            for row in range(len(plan)):
+                rarity.add(row + 1, plan.combination(row))
+            self.write_ranked_metadata(output_dir, rarity, pretty_metadata=pretty_metadata,
+                                       metadata_jsonl=metadata_jsonl, shard_size=shard_size, digests=digests,
+                                       image_uri=image_uri)
+            rarity.save(os.path.join(output_dir, RARITY_FILENAME))
+        else:
+            with MetadataWriter(output_dir, pretty=pretty_metadata, jsonl=metadata_jsonl,
+                                shard_size=shard_size) as writer:
+                for row in range(len(plan)):
+                    checksum = digests.get(row + 1) if digests is not None else None
+                    writer.write(row + 1, self.create_metadata(row + 1, plan.combination(row), checksum,
+                                                               image_uri=image_uri))
+        return {"tokens": len(plan), "shards": len(shards)}
 
-        # Gera o arquivo CSV com todos os metadados
-        csv_path = os.path.join(output_dir, "metadata.csv")
-        with open(csv_path, "w", newline='') as csvfile:
-            fieldnames = ["name", "description", "image", "attributes", "external_url"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for metadata in metadata_list:
-                writer.writerow(metadata)
+    @staticmethod
+    def _add_rarity_fields(metadata, score, rank):
+        metadata["rarity_score"] = round(float(score), 4)
+        metadata["rarity_rank"] = int(rank)
 
-        print("Geração de NFTs concluída.")
+    @property
+    def layer_source(self):
+        """
+        Origem das camadas na composição: o pacote mapeado, se houver, ou o cache de camadas.
+        """
+        return self.asset_pack if self.asset_pack is not None else self.layer_cache
+
+    def _create_render_pool(self, workers, outputs, image_dir, shard_size=None, collect=False,
+                            reuse_prefixes=False):
+        """
+        Cria o pool de processos de renderização; cada processo tem um cache de composições
+        parciais só com ``reuse_prefixes``.
+        """
+        # "spawn" evita herdar o estado de threads da interface (Tk) no fork
+        context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                   initializer=_init_render_worker,
+                                   initargs=(self.layer_cache.max_bytes,
+                                             self.composite_cache.max_bytes if reuse_prefixes else None,
+                                             outputs, image_dir, self.asset_pack.path if self.asset_pack else None,
+                                             shard_size, collect))
+
+    def _finish_pending(self, pending_item, run):
+        future, nft_id, combination, output_path = pending_item
+        if future is None:
+            # NFT concluída em uma execução anterior: só refaz os metadados para o CSV
+            checksum = run.digests.get(nft_id) if run.digests is not None else None
+            run.metadata_writer.write(nft_id, self.create_metadata(nft_id, combination, checksum))
+            if run.rarity is not None:
+                run.rarity.add(nft_id, combination)
+            return
+        result = future.result()  # Propaga a exceção do processo que falhou
+        if isinstance(result, tuple):
+            # Resultado de um processo do pool: os tempos foram medidos lá
+            result, measured, files = result
+            run.stats.merge(measured)
+            for name, data in files or ():
+                run.archive.add(name, data)
+        self._finish_nft(nft_id, combination, result, output_path, run)
+
+    def _finish_nft(self, nft_id, combination, checksum, output_path, run):
+        """
+        Envia os metadados de uma NFT já renderizada para escrita, registra-a no diário e notifica o callback.
+        """
+        # Gera metadados no formato ERC-1155 (sem o campo "decimals")
+        if run.digests is not None:
+            run.digests.set(nft_id, checksum)
+        metadata = self.create_metadata(nft_id, combination, checksum)
+        run.metadata_writer.write(nft_id, metadata)
+        run.journal.record(nft_id, combination, checksum)
+        if run.rarity is not None:
+            run.rarity.add(nft_id, combination)
+        run.stats.token_done(nft_id)
+
+        # Log da geração de cada NFT no terminal
+        if run.verbose:
+            print(f"NFT {nft_id} gerada: {metadata['name']} com atributos: {metadata['attributes']}")
+
+        if run.callback:
+            run.callback(output_path)
 
     def load_layer_files_with_rarity(self, layers, rarities):
         """
         Carrega arquivos das camadas filtrando pelos diretórios de raridades selecionadas.
 
+        Os diretórios são lidos pelo índice de camadas e os itens saem ordenados por nome,
+        então a mesma semente produz as mesmas NFTs em qualquer máquina.
+
         Args:
             layers (list): Lista de camadas com caminhos e itens.
             rarities (set): Conjunto de raridades escolhidas.
 
         Returns:
             list: Lista de arquivos das camadas filtrados por raridade.
+
+        Raises:
+            ValueError: Se alguma imagem é ilegível ou tem tamanho diferente das demais.
         """
         layer_files = []
+        entries = []
         for layer in layers:
             rarity_files = {}
             for rarity in self.rarity_probabilities.keys():
@@ -127,15 +906,21 @@ class NFTGenerator:
                     continue  # Ignora raridades não selecionadas
                 rarity_path = os.path.join(layer["path"], rarity)
                 if os.path.isdir(rarity_path):
-                    files = [{"name": layer["name"], "rarity": rarity, "file": os.path.join(rarity_path, f)}
-                             for f in os.listdir(rarity_path) if f.lower().endswith((".png", ".jpg", ".jpeg"))]
+                    rarity_entries = self.asset_index.scan(rarity_path)
+                    files = [{"name": layer["name"], "rarity": rarity, "file": os.path.join(rarity_path, entry["filename"])}
+                             for entry in rarity_entries]
                     if files:
                         rarity_files[rarity] = files
-            
+                        entries.extend(rarity_entries)
+
             if not rarity_files:
                 print(f"Aviso: Nenhum item disponível para a camada '{layer['name']}' nas raridades selecionadas.")
 
             layer_files.append(rarity_files)
+        self.asset_index.save()
+
+        # Rejeita camadas incompatíveis antes de qualquer NFT ser gerada
+        check_layer_sizes(entries)
         return layer_files
 
     def select_random_item_with_rarity(self, layer_rarity_files):
@@ -161,13 +946,15 @@ class NFTGenerator:
 
         return random.choice(layer_rarity_files[rarity])
 
-    def create_metadata(self, nft_id, combination):
+    def create_metadata(self, nft_id, combination, checksum=None, image_uri=None):
         """
         Cria os metadados para uma NFT.
 
         Args:
             nft_id (int): ID da NFT.
             combination (list): Lista de itens (camadas) na NFT.
+            checksum (str): SHA-256 da imagem, usado quando ``image_uri`` tem ``{sha256}`` ou ``{cid}``.
+            image_uri (str): Modelo do campo "image"; ``self.image_uri`` se omitido.
 
         Returns:
             dict: Metadados da NFT.
@@ -175,7 +962,7 @@ class NFTGenerator:
         metadata = {
             "name": f"NFT #{nft_id}",
             "description": "Uma NFT única",
-            "image": f"https://example.com/image/{nft_id}.png",
+            "image": format_image_uri(image_uri or self.image_uri, nft_id, checksum),
             "external_url": f"https://example.com/nft/{nft_id}",
             "attributes": [
                 {"trait_type": item["name"], "value": item["rarity"]}
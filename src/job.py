@@ -0,0 +1,152 @@
+import threading
+
+# Estados de uma GenerationJob
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLING = "cancelling"
+CANCELLED = "cancelled"
+FINISHED = "finished"
+FAILED = "failed"
+
+
+class GenerationJob:
+    """
+    Geração em andamento em uma thread própria, criada por ``NFTGenerator.start``.
+
+    A geração pode ser pausada, retomada e cancelada a qualquer momento, de qualquer
+    thread. A pausa e o cancelamento valem entre duas NFTs: as NFTs já enviadas para
+    renderização são concluídas e registradas primeiro, então a saída parcial é
+    consistente (cada NFT do diário tem imagem e metadados) e pode ser continuada com
+    ``generate(..., resume=True)``.
+
+    Os eventos de progresso são os de ``GenerationStats`` (``start``, ``token`` e
+    ``finish``) mais ``paused``, ``resumed`` e ``cancelled``; os ouvintes são chamados
+    nas threads da geração e devem ser rápidos.
+    """
+
+    def __init__(self, stats):
+        """
+        Args:
+            stats (GenerationStats): Instrumentação da geração, que distribui os eventos.
+        """
+        self.stats = stats
+        self.state = RUNNING
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._result = None
+        self._error = None
+
+    def add_listener(self, listener):
+        """
+        Registra uma função chamada com cada evento (dict com a chave ``event``).
+        """
+        self.stats.add_hook(listener)
+
+    def run(self, target, *args, **kwargs):
+        """
+        Executa ``target(*args, job=self, **kwargs)`` em uma nova thread.
+        """
+        self._thread = threading.Thread(target=self._run, args=(target, args, kwargs), name="generation",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self, target, args, kwargs):
+        try:
+            self._result = target(*args, job=self, **kwargs)
+        except BaseException as e:
+            self._error = e
+        with self._lock:
+            if self._error is not None:
+                self.state = FAILED
+            elif self._cancelled.is_set():
+                self.state = CANCELLED
+            else:
+                self.state = FINISHED
+        if self.state == CANCELLED:
+            self.stats.emit("cancelled", tokens=self.stats.tokens)
+        self._done.set()
+
+    def pause(self):
+        """
+        Pausa a geração depois das NFTs já enviadas para renderização.
+        """
+        with self._lock:
+            if self.state != RUNNING:
+                return
+            self.state = PAUSED
+            self._running.clear()
+
+    def resume(self):
+        """
+        Continua uma geração pausada.
+        """
+        with self._lock:
+            if self.state != PAUSED:
+                return
+            self.state = RUNNING
+            self._running.set()
+        self.stats.emit("resumed", tokens=self.stats.tokens)
+
+    def cancel(self):
+        """
+        Cancela a geração; as NFTs em andamento são concluídas e nenhuma nova é iniciada.
+        """
+        with self._lock:
+            if self.state not in (RUNNING, PAUSED):
+                return
+            self.state = CANCELLING
+            self._cancelled.set()
+            self._running.set()  # Acorda uma geração pausada para que ela termine
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def checkpoint(self, drain=None):
+        """
+        Ponto entre duas NFTs em que a geração obedece à pausa e ao cancelamento.
+
+        Args:
+            drain (function): Conclui as NFTs em andamento antes de a geração ficar parada.
+
+        Returns:
+            bool: False se a geração foi cancelada e não deve iniciar novas NFTs.
+        """
+        if not self._running.is_set():
+            if drain is not None:
+                drain()
+            self.stats.emit("paused", tokens=self.stats.tokens)
+            self._running.wait()
+        return not self._cancelled.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Espera o fim da geração.
+
+        Returns:
+            bool: True se a geração terminou (concluída, cancelada ou com erro).
+        """
+        return self._done.wait(timeout)
+
+    def result(self, timeout=None):
+        """
+        Espera o fim da geração e retorna o ``GenerationStats`` de ``generate``.
+
+        Raises:
+            TimeoutError: Se a geração não terminou dentro de ``timeout``.
+            Exception: O erro que interrompeu a geração.
+        """
+        if not self.wait(timeout):
+            raise TimeoutError("A geração ainda está em andamento.")
+        if self._error is not None:
+            raise self._error
+        return self._result
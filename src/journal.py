@@ -0,0 +1,115 @@
+import os
+import json
+
+JOURNAL_FILENAME = "journal.jsonl"
+# Combinações de gerações anteriores do mesmo NFTGenerator, fora do cabeçalho do diário
+PREVIOUS_COMBINATIONS_FILENAME = "previous_combinations.npz"
+
+
+class GenerationJournal:
+    """
+    Diário de geração somente de acréscimo, gravado no diretório de saída.
+
+    A primeira linha é um cabeçalho com os parâmetros e a semente da geração; como a
+    combinação de cada ID depende só da semente e do ID, isso basta para refazer o
+    plano. Cada linha seguinte registra uma
+    NFT concluída: ID, combinação e checksum SHA-256 da imagem gravada. Com isso uma
+    geração interrompida pode ser retomada sem renderizar de novo o que já foi feito.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, JOURNAL_FILENAME)
+        self._file = None
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def start(self, header):
+        """
+        Cria um diário novo, substituindo o anterior, e grava o cabeçalho.
+
+        Args:
+            header (dict): Parâmetros e semente da geração.
+        """
+        self.close()
+        self._file = open(self.path, "w")
+        self._write({"type": "header", **header})
+
+    def open(self):
+        """
+        Reabre um diário existente para continuar acrescentando NFTs.
+
+        Uma última linha incompleta (queda no meio da escrita) é descartada, para que
+        o próximo registro não seja gravado emendado nela.
+        """
+        self.close()
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            position = end
+            while position > 0:
+                step = min(1 << 16, position)
+                f.seek(position - step)
+                block = f.read(step)
+                newline = block.rfind(b"\n")
+                if newline >= 0:
+                    position = position - step + newline + 1
+                    break
+                position -= step
+            if position != end:
+                f.truncate(position)
+        self._file = open(self.path, "a")
+
+    def record(self, nft_id, combination, checksum):
+        """
+        Registra uma NFT concluída.
+
+        Args:
+            nft_id (int): ID da NFT.
+            combination (list): Itens (camadas) da NFT.
+            checksum (str): SHA-256 da imagem gravada.
+        """
+        self._write({
+            "type": "token",
+            "id": nft_id,
+            "combination": [[item["name"], item["rarity"], item["file"]] for item in combination],
+            "sha256": checksum,
+        })
+
+    def read_header(self):
+        """
+        Lê só o cabeçalho do diário.
+        """
+        for entry in self._entries():
+            if entry.get("type") == "header":
+                return entry
+            break
+        raise ValueError(f"Diário de geração sem cabeçalho: {self.path}")
+
+    def iter_tokens(self):
+        """
+        Percorre as NFTs concluídas sem carregar o diário inteiro na memória.
+
+        Uma última linha incompleta (queda no meio da escrita) é ignorada.
+        """
+        for entry in self._entries():
+            if entry.get("type") == "token":
+                yield entry
+
+    def _entries(self):
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry) + "\n")
+        # Garante que a linha chegue ao sistema operacional antes da próxima NFT
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,130 @@
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+# Orçamento padrão de memória para as camadas decodificadas (256 MB)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def layer_footprint(image):
+    """
+    Calcula a área visível de uma camada RGBA.
+
+    Returns:
+        tuple: (bbox dos pixels com alfa maior que zero, ou None se a camada é toda
+            transparente; True se todos os pixels são opacos).
+    """
+    alpha = image.getchannel("A")
+    lowest, _ = alpha.getextrema()
+    return alpha.getbbox(), lowest == 255
+
+
+class LayerCache:
+    """
+    Cache LRU de camadas já decodificadas em RGBA.
+
+    As entradas são indexadas pelo caminho do arquivo e pelo seu mtime, de modo
+    que um arquivo alterado no disco é decodificado novamente. Quando o total de
+    bytes ultrapassa ``max_bytes`` as entradas usadas há mais tempo são descartadas.
+    Junto com cada camada fica a sua área visível (ver ``footprint``).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # caminho -> [mtime, imagem, bytes, área visível]
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Retorna a camada em RGBA, decodificando-a apenas se não estiver no cache.
+
+        A imagem retornada é compartilhada entre chamadas e não deve ser alterada.
+
+        Args:
+            path (str): Caminho do arquivo da camada.
+
+        Returns:
+            PIL.Image.Image: Camada convertida para RGBA.
+        """
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        with Image.open(path) as source:
+            image = source.convert("RGBA")
+        size = image.width * image.height * 4
+
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+            # Camadas maiores que o orçamento inteiro não são armazenadas
+            if size <= self.max_bytes:
+                self._entries[path] = [mtime, image, size, None]
+                self.current_bytes += size
+                self._evict()
+        return image
+
+    def footprint(self, path, image):
+        """
+        Retorna a área visível de uma camada obtida com ``get``, calculada uma vez e
+        guardada junto com a imagem.
+
+        Args:
+            path (str): Caminho do arquivo da camada.
+            image (PIL.Image.Image): Camada retornada por ``get(path)``.
+
+        Returns:
+            tuple: Resultado de ``layer_footprint``.
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[1] is image and entry[3] is not None:
+                return entry[3]
+        footprint = layer_footprint(image)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[1] is image:
+                entry[3] = footprint
+        return footprint
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, _, size, _) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        """Remove todas as camadas do cache, mantendo os contadores."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """
+        Retorna os contadores do cache para dimensionamento do orçamento.
+
+        Returns:
+            dict: Acertos, falhas, descartes, entradas e bytes em uso.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -1,50 +1,112 @@
-import tkinter as tk
-from ui import NFTGeneratorApp
-import requests
-import zipfile
+import time
+
+# Instante de início do processo, antes das importações, para medir a abertura da janela
+_STARTED = time.perf_counter()
+
 import os
-import shutil
 import sys
 import json
+import shutil
+import threading
+import tkinter as tk
+from tkinter import messagebox
+from ui import NFTGeneratorApp
 
 UPDATE_URL = "https://raw.githubusercontent.com/KaueLui/Felony/main/json/version.json"  # URL do JSON de versão no GitHub
+CURRENT_VERSION = "1.5.1"  # Atualize para a versão atual do programa
+# Tempo máximo de espera pelo servidor de atualizações, em segundos
+UPDATE_TIMEOUT = 3
+# Intervalo entre consultas ao servidor; nesse meio-tempo vale o resultado guardado em disco
+UPDATE_CHECK_INTERVAL = int(os.environ.get("FELONY_UPDATE_INTERVAL", 24 * 60 * 60))
+UPDATE_CACHE_PATH = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                                 "felony", "update_check.json")
+# Meta de tempo entre o início do processo e a janela pronta, em segundos
+STARTUP_TARGET_SECONDS = 1.0
 
-def check_for_updates():
+
+def fetch_update_info(timeout=UPDATE_TIMEOUT, interval=UPDATE_CHECK_INTERVAL, cache_path=UPDATE_CACHE_PATH):
     """
-    Verifica no repositório remoto se há uma nova versão disponível.
+    Obtém a versão mais recente publicada, consultando o servidor no máximo uma vez por ``interval``.
+
+    Returns:
+        dict: ``version`` e ``download_url`` da versão remota.
     """
     try:
-        print("Verificando atualizações...")
-        response = requests.get(UPDATE_URL)
-        response.raise_for_status()
-        remote_data = response.json()
-        remote_version = remote_data.get("version")
-        download_url = remote_data.get("download_url")
+        with open(cache_path, "r") as f:
+            cached = json.load(f)
+        if time.time() - cached["checked_at"] < interval:
+            return cached
+    except (OSError, ValueError, KeyError):
+        pass
+
+    import requests  # Importado só aqui: não pesa na abertura da janela
+
+    response = requests.get(UPDATE_URL, timeout=timeout)
+    response.raise_for_status()
+    remote_data = response.json()
+    info = {
+        "checked_at": time.time(),
+        "version": remote_data.get("version"),
+        "download_url": remote_data.get("download_url"),
+    }
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump(info, f)
+    except OSError:
+        pass  # Sem cache a próxima abertura apenas consulta o servidor de novo
+    return info
+
+
+def check_for_updates(root):
+    """
+    Verifica em segundo plano se há uma nova versão disponível, sem bloquear a interface.
+
+    A consulta roda em uma thread; o resultado é lido na thread do Tk, que pergunta
+    ao usuário se deseja atualizar.
+    """
+    result = {}
 
+    def fetch():
+        try:
+            result["info"] = fetch_update_info()
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=fetch, daemon=True)
+    thread.start()
+
+    def poll():
+        if thread.is_alive():
+            root.after(200, poll)
+            return
+        if "error" in result:
+            print(f"Erro ao verificar atualizações: {result['error']}")
+            return
+        remote_version = result["info"].get("version")
+        download_url = result["info"].get("download_url")
         if not remote_version or not download_url:
             print("Informações de versão ou URL de download ausentes no arquivo remoto.")
             return
-
-        # Versão atual do programa
-        current_version = "1.5.1"  # Atualize para a versão atual do programa
-        if remote_version > current_version:
-            user_response = input(f"Nova versão {remote_version} disponível! Deseja atualizar? (s/n): ")
-            if user_response.lower() == 's':
-                download_and_install_update(download_url)
+        if remote_version > CURRENT_VERSION:
+            if messagebox.askyesno("Atualização", f"Nova versão {remote_version} disponível! Deseja atualizar?"):
+                threading.Thread(target=download_and_install_update, args=(download_url,), daemon=True).start()
             else:
                 print("Atualização ignorada pelo usuário.")
-        else:
-            print("Você já está usando a versão mais recente.")
-    except Exception as e:
-        print(f"Erro ao verificar atualizações: {e}")
+
+    root.after(200, poll)
+
 
 def download_and_install_update(download_url):
     """
     Faz o download da nova versão e instala os arquivos atualizados.
     """
+    import zipfile
+    import requests
+
     try:
         print("Baixando atualização...")
-        response = requests.get(download_url, stream=True)
+        response = requests.get(download_url, stream=True, timeout=UPDATE_TIMEOUT)
         response.raise_for_status()
 
         # Salvar o arquivo ZIP de atualização
@@ -80,11 +142,34 @@ def download_and_install_update(download_url):
     except Exception as e:
         print(f"Erro ao instalar atualização: {e}")
 
-if __name__ == "__main__":
-    # Verifica atualizações antes de iniciar a aplicação
-    check_for_updates()
 
-    # Inicia a interface principal
+def report_startup(root, benchmark=False):
+    """
+    Mede o tempo até a janela ficar pronta e avisa quando ele passa da meta.
+
+    Com ``benchmark`` o tempo é impresso em JSON e a janela é fechada
+    (ver ``benchmarks/bench_startup.py``).
+    """
+    elapsed = time.perf_counter() - _STARTED
+    if benchmark:
+        print(json.dumps({"startup_seconds": elapsed, "target_seconds": STARTUP_TARGET_SECONDS}))
+        root.destroy()
+    elif elapsed > STARTUP_TARGET_SECONDS:
+        print(f"Aviso: a janela levou {elapsed:.2f}s para abrir (meta: {STARTUP_TARGET_SECONDS:.1f}s).")
+
+
+def main():
+    benchmark = bool(os.environ.get("FELONY_STARTUP_BENCH"))
+
+    # Inicia a interface principal antes de qualquer acesso à rede
     root = tk.Tk()
     app = NFTGeneratorApp(root)
+    root.after_idle(report_startup, root, benchmark)
+    if not benchmark:
+        # Verifica atualizações depois que a janela já está aberta
+        root.after_idle(check_for_updates, root)
     root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import os
+import csv
+import json
+import time
+import queue
+import threading
+from output_layout import ShardedLayout
+
+CSV_FIELDNAMES = ["name", "description", "image", "attributes", "external_url", "rarity_score", "rarity_rank"]
+
+_STOP = object()
+
+
+class MetadataWriter:
+    """
+    Grava os metadados das NFTs em uma thread de E/S em segundo plano.
+
+    Cada NFT recebida gera o seu JSON individual e uma linha no ``metadata.csv``
+    (e, opcionalmente, no ``metadata.jsonl``) assim que chega, sem acumular os
+    metadados em memória. A fila é limitada, então uma escrita lenta segura a
+    geração em vez de fazer a memória crescer.
+
+    As linhas do CSV/JSONL saem em ordem de ID: NFTs que chegam adiantadas ficam
+    retidas só até as anteriores chegarem. Com ``ordered=False`` as linhas saem na
+    ordem de chegada, sem reter nada em memória.
+
+    Com ``atomic=True`` o CSV/JSONL são gravados em arquivos temporários que só
+    substituem os existentes no ``close`` sem erros: uma queda no meio de uma
+    regravação completa (o ranking de raridade) mantém os arquivos anteriores.
+    """
+
+    def __init__(self, output_dir, metadata_dir=None, pretty=True, jsonl=False, queue_size=1024, stats=None,
+                 shard_size=None, ordered=True, first_id=1, archive=None, json_files=True, atomic=False):
+        """
+        Args:
+            output_dir (str): Diretório do ``metadata.csv`` e do ``metadata.jsonl``.
+            metadata_dir (str): Diretório dos JSON individuais; ``output_dir/metadata`` se omitido.
+            pretty (bool): Indenta os JSON individuais; se False grava em formato compacto.
+            jsonl (bool): Também grava todos os metadados em um único ``metadata.jsonl``.
+            queue_size (int): Quantidade máxima de NFTs aguardando escrita.
+            stats (GenerationStats): Instrumentação opcional; o tempo vai para a etapa ``metadata_write``.
+            shard_size (int): NFTs por subdiretório dos JSON individuais (ver ``ShardedLayout``).
+            ordered (bool): Mantém o CSV/JSONL em ordem de ID.
+            first_id (int): Primeiro ID esperado no modo ordenado (o início de uma parte da coleção).
+            archive (ArchiveWriter): Grava os JSON individuais neste pacote, em ``metadata/``,
+                em vez de arquivos soltos.
+            json_files (bool): Grava os JSON individuais; False grava só o CSV/JSONL.
+            atomic (bool): Substitui o CSV/JSONL existentes só no final, de uma vez.
+        """
+        self.stats = stats
+        self.layout = ShardedLayout(shard_size)
+        self.ordered = ordered
+        self.metadata_dir = metadata_dir or os.path.join(output_dir, "metadata")
+        self.archive = archive
+        self.json_files = json_files
+        self.atomic = atomic
+        if archive is None and json_files:
+            os.makedirs(self.metadata_dir, exist_ok=True)
+        self.csv_path = os.path.join(output_dir, "metadata.csv")
+        self.jsonl_path = os.path.join(output_dir, "metadata.jsonl") if jsonl else None
+        self.dump_options = {"indent": 4} if pretty else {"separators": (",", ":")}
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._held = {}  # ID -> metadados que chegaram antes dos IDs anteriores
+        self._next_id = first_id
+        self._error = None
+        self._discard = False
+        self._thread = threading.Thread(target=self._run, name="metadata-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, nft_id, metadata):
+        """
+        Enfileira os metadados de uma NFT para escrita.
+
+        Args:
+            nft_id (int): ID da NFT.
+            metadata (dict): Metadados da NFT.
+        """
+        self._raise_error()
+        self._queue.put((nft_id, metadata))
+
+    def close(self):
+        """
+        Espera a escrita de tudo o que foi enfileirado e fecha os arquivos.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._discard = exc_type is not None
+        self.close()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"Erro ao gravar os metadados: {self._error}") from self._error
+
+    def _run(self):
+        csv_file = jsonl_file = writer = None
+        try:
+            csv_file = open(self._write_path(self.csv_path), "w", newline='')
+            jsonl_file = open(self._write_path(self.jsonl_path), "w") if self.jsonl_path else None
+            writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDNAMES)
+            writer.writeheader()
+        except Exception as e:
+            # O próximo write()/close() informa o erro; a fila continua sendo esvaziada
+            self._error = e
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                if self._error is not None:
+                    continue  # Apenas esvazia a fila para não travar quem está enfileirando
+                start = time.perf_counter()
+                try:
+                    self._write_item(item, writer, jsonl_file)
+                except Exception as e:
+                    self._error = e
+                if self.stats is not None:
+                    self.stats.add("metadata_write", time.perf_counter() - start)
+            # IDs que nunca chegaram (geração interrompida) não seguram as linhas seguintes
+            if self._error is None:
+                for nft_id in sorted(self._held):
+                    self._write_row(self._held.pop(nft_id), writer, jsonl_file)
+        except Exception as e:
+            self._error = e
+        finally:
+            if csv_file is not None:
+                csv_file.close()
+            if jsonl_file is not None:
+                jsonl_file.close()
+            if self.atomic:
+                self._publish()
+
+    def _publish(self):
+        # Uma regravação interrompida (erro ou exceção no bloco with) não substitui os arquivos anteriores
+        for path in filter(None, (self.csv_path, self.jsonl_path)):
+            if not os.path.isfile(self._write_path(path)):
+                continue
+            if self._error is None and not self._discard:
+                os.replace(self._write_path(path), path)
+            else:
+                os.remove(self._write_path(path))
+
+    def _write_path(self, path):
+        return f"{path}.{os.getpid()}.tmp" if self.atomic else path
+
+    def _write_item(self, item, writer, jsonl_file):
+        nft_id, metadata = item
+        if self.json_files:
+            self._write_json(nft_id, metadata)
+
+        if not self.ordered:
+            self._write_row(metadata, writer, jsonl_file)
+            return
+
+        self._held[nft_id] = metadata
+        while self._next_id in self._held:
+            self._write_row(self._held.pop(self._next_id), writer, jsonl_file)
+            self._next_id += 1
+
+    def _write_json(self, nft_id, metadata):
+        if self.archive is not None:
+            name = self.layout.path("metadata", nft_id, f"NFT_{nft_id}.json").replace(os.sep, "/")
+            self.archive.add(name, json.dumps(metadata, **self.dump_options).encode("utf-8"))
+            return
+        with open(self.layout.path(self.metadata_dir, nft_id, f"NFT_{nft_id}.json", create=True), "w") as f:
+            json.dump(metadata, f, **self.dump_options)
+
+    def _write_row(self, metadata, writer, jsonl_file):
+        writer.writerow(metadata)
+        if jsonl_file is not None:
+            jsonl_file.write(json.dumps(metadata, separators=(",", ":")) + "\n")
@@ -0,0 +1,148 @@
+import io
+import time
+import base64
+import tarfile
+import zipfile
+import threading
+import numpy as np
+
+# Modelo padrão do campo "image" dos metadados
+DEFAULT_IMAGE_URI = "https://example.com/image/{id}.png"
+# Campos do modelo que dependem do conteúdo da imagem
+CONTENT_FIELDS = ("{sha256}", "{cid}")
+# Extensão do arquivo compactado -> modo de escrita do tarfile (None para zip)
+ARCHIVE_FORMATS = {".zip": None, ".tar": "w", ".tar.gz": "w:gz", ".tgz": "w:gz"}
+# Formatos já comprimidos, guardados no zip sem uma nova compressão
+_STORED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def content_id(checksum):
+    """
+    Retorna o CID v1 (codec raw, multihash sha2-256, base32) de um SHA-256.
+
+    É o mesmo CID de ``ipfs add --cid-version 1 --raw-leaves`` para arquivos de até
+    um bloco (256 KiB); arquivos maiores são divididos em blocos pelo IPFS e têm outro CID.
+
+    Args:
+        checksum (str): SHA-256 em hexadecimal.
+    """
+    raw = bytes([0x01, 0x55, 0x12, 0x20]) + bytes.fromhex(checksum)
+    return "b" + base64.b32encode(raw).decode("ascii").lower().rstrip("=")
+
+
+def uses_content_hash(template):
+    """
+    Informa se o modelo de URI precisa do hash da imagem.
+    """
+    return any(field in template for field in CONTENT_FIELDS)
+
+
+def format_image_uri(template, nft_id, checksum=None):
+    """
+    Preenche o modelo do campo "image", por exemplo ``ipfs://{cid}`` ou
+    ``https://cdn.example.com/{sha256}.png``. Os campos são ``{id}``, ``{sha256}`` e ``{cid}``.
+
+    Raises:
+        ValueError: Se o modelo usa o hash e ``checksum`` não foi informado.
+    """
+    if checksum is None:
+        if uses_content_hash(template):
+            raise ValueError(f"O modelo de URI da imagem usa o hash, mas a NFT {nft_id} não tem hash.")
+        return template.format(id=nft_id)
+    return template.format(id=nft_id, sha256=checksum, cid=content_id(checksum))
+
+
+class ArchiveWriter:
+    """
+    Grava imagens e metadados direto em um arquivo ``.zip``, ``.tar`` ou ``.tar.gz``.
+
+    Cada arquivo entra no pacote a partir dos bytes já em memória, então os bytes de
+    uma imagem são escritos uma única vez, sem arquivos soltos no disco. Pode ser usado
+    por várias threads ao mesmo tempo.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        extension = next((ext for ext in ARCHIVE_FORMATS if path.lower().endswith(ext)), None)
+        if extension is None:
+            raise ValueError(f"Formato de arquivo compactado não suportado: '{path}'. "
+                             f"Use um de: {', '.join(ARCHIVE_FORMATS)}.")
+        mode = ARCHIVE_FORMATS[extension]
+        self._zip = zipfile.ZipFile(path, "w", allowZip64=True) if mode is None else None
+        self._tar = tarfile.open(path, mode) if mode is not None else None
+        self._lock = threading.Lock()
+        self.entries = 0
+
+    def add(self, name, data):
+        """
+        Acrescenta um arquivo ao pacote.
+
+        Args:
+            name (str): Caminho dentro do pacote, com "/" como separador.
+            data (bytes): Conteúdo do arquivo.
+        """
+        with self._lock:
+            if self._zip is not None:
+                stored = name.lower().endswith(_STORED_EXTENSIONS)
+                self._zip.writestr(name, data, compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = time.time()
+                self._tar.addfile(info, io.BytesIO(data))
+            self.entries += 1
+
+    def add_file(self, path, name):
+        """
+        Acrescenta ao pacote um arquivo já gravado no disco.
+        """
+        with open(path, "rb") as f:
+            self.add(name, f.read())
+
+    def close(self):
+        """
+        Finaliza o pacote; o que foi acrescentado até aqui fica legível.
+        """
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+            if self._tar is not None:
+                self._tar.close()
+
+
+class CollectedFiles:
+    """
+    Destino em memória com a interface de ``ArchiveWriter``: um processo de renderização
+    coleta os arquivos da NFT e os devolve para o processo principal gravar no pacote.
+    """
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, name, data):
+        self.entries.append((name, data))
+
+    def drain(self):
+        entries, self.entries = self.entries, []
+        return entries
+
+
+class ContentDigests:
+    """
+    SHA-256 de cada NFT da geração, guardados como 32 bytes por ID para que a memória
+    não dependa de textos por NFT em coleções grandes.
+    """
+
+    def __init__(self, max_id):
+        self._digests = np.zeros((max_id + 1, 32), dtype=np.uint8)
+        self._known = np.zeros(max_id + 1, dtype=bool)
+
+    def set(self, nft_id, checksum):
+        self._digests[nft_id] = np.frombuffer(bytes.fromhex(checksum), dtype=np.uint8)
+        self._known[nft_id] = True
+
+    def get(self, nft_id):
+        """
+        Retorna o SHA-256 em hexadecimal, ou None se a NFT não tem hash registrado.
+        """
+        return self._digests[nft_id].tobytes().hex() if self._known[nft_id] else None
@@ -0,0 +1,42 @@
+import os
+import threading
+
+# Arquivos por subdiretório no modo de coleções grandes
+DEFAULT_SHARD_SIZE = 1000
+# Acima desta quantidade de NFTs a interface e a linha de comando usam o modo de coleções grandes
+LARGE_COLLECTION_THRESHOLD = 10000
+
+
+class ShardedLayout:
+    """
+    Distribui os arquivos das NFTs em subdiretórios de ``shard_size`` IDs cada.
+
+    Com ``shard_size`` igual a None (ou 0) os arquivos ficam direto no diretório
+    base, como sempre. Com ``shard_size=1000`` a NFT 1234 fica em ``base/0001/``,
+    evitando diretórios com milhões de arquivos em coleções grandes.
+    """
+
+    def __init__(self, shard_size=None):
+        self.shard_size = shard_size or None
+        self._created = set()
+        self._lock = threading.Lock()
+
+    def directory(self, base, nft_id):
+        """
+        Retorna o diretório da NFT dentro de ``base``, sem criá-lo.
+        """
+        if self.shard_size is None:
+            return base
+        return os.path.join(base, f"{(nft_id - 1) // self.shard_size:04d}")
+
+    def path(self, base, nft_id, filename, create=False):
+        """
+        Retorna o caminho de um arquivo da NFT; com ``create`` o subdiretório é criado
+        (uma única vez por subdiretório).
+        """
+        directory = self.directory(base, nft_id)
+        if create and directory not in self._created:
+            os.makedirs(directory, exist_ok=True)
+            with self._lock:
+                self._created.add(directory)
+        return os.path.join(directory, filename)
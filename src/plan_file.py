@@ -0,0 +1,123 @@
+import os
+import re
+import json
+import hashlib
+import numpy as np
+from planner import CombinationPlan
+
+PLAN_VERSION = 1
+# Subdiretório do diretório de saída com o diário e o CSV de cada parte da coleção
+SHARDS_DIRNAME = "shards"
+_SHARD_PATTERN = re.compile(r"^(\d+)-of-(\d+)$")
+
+
+def save_plan(plan, path, header):
+    """
+    Grava o plano completo (ID -> combinação) em um arquivo compacto.
+
+    O arquivo é um ``.npz`` com a matriz de índices, a raridade especial de cada NFT e
+    um cabeçalho JSON com a semente, os parâmetros e os itens de cada camada. Os itens
+    são identificados pela raridade e pelo nome do arquivo, então máquinas com as
+    camadas em outros caminhos usam o mesmo plano.
+
+    Args:
+        plan (CombinationPlan): Plano da geração.
+        path (str): Arquivo a ser criado.
+        header (dict): Semente e parâmetros da geração (quantidade, raridades, regras).
+    """
+    planner = plan.planner
+    metadata = {
+        "version": PLAN_VERSION,
+        **header,
+        "layers": [items[0]["name"] for items in planner.layer_items],
+        "items": [[[item["rarity"], os.path.basename(item["file"])] for item in items]
+                  for items in planner.layer_items],
+        "special_rarities": planner.special_rarities,
+    }
+    dtype = np.int16 if max(planner.radices) < 2 ** 15 else np.int32
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as f:
+        np.savez_compressed(
+            f,
+            indices=plan.indices.astype(dtype),
+            special=plan.special.astype(np.int16),
+            header=np.frombuffer(json.dumps(metadata).encode("utf-8"), dtype=np.uint8),
+        )
+    os.replace(temporary_path, path)
+
+
+def read_plan_header(path):
+    """
+    Lê só o cabeçalho de um arquivo de plano.
+    """
+    with np.load(path) as data:
+        header = json.loads(data["header"].tobytes().decode("utf-8"))
+    if header.get("version") != PLAN_VERSION:
+        raise ValueError(f"Versão de arquivo de plano não suportada: {path}")
+    return header
+
+
+def load_plan(path, planner):
+    """
+    Carrega um plano gravado com ``save_plan`` sobre as camadas de ``planner``.
+
+    Raises:
+        ValueError: Se as camadas do planner não são as mesmas do plano.
+    """
+    header = read_plan_header(path)
+    items = [[[item["rarity"], os.path.basename(item["file"])] for item in layer_items]
+             for layer_items in planner.layer_items]
+    if items != header["items"] or planner.special_rarities != header["special_rarities"]:
+        raise ValueError(f"As camadas não correspondem às do arquivo de plano: {path}")
+    with np.load(path) as data:
+        indices = data["indices"].astype(np.int64)
+        special = data["special"].astype(np.int64)
+    codes = np.full(len(indices), -1, dtype=planner.code_dtype)
+    regular = special < 0
+    codes[regular] = planner.encode(indices[regular])
+    return CombinationPlan(planner, indices, codes, special)
+
+
+def plan_digest(path):
+    """
+    SHA-256 do arquivo de plano, usado para conferir que todas as partes usaram o mesmo plano.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def shard_range(total, shard, shards):
+    """
+    Retorna o intervalo de linhas do plano ``[início, fim)`` da parte ``shard`` (a partir de 1) de ``shards``.
+    """
+    if not 1 <= shard <= shards:
+        raise ValueError(f"Parte inválida: {shard} de {shards}.")
+    return (shard - 1) * total // shards, shard * total // shards
+
+
+def shard_directory(output_dir, shard, shards):
+    """
+    Diretório do diário e do CSV da parte ``shard`` de ``shards``.
+    """
+    return os.path.join(output_dir, SHARDS_DIRNAME, f"{shard:04d}-of-{shards:04d}")
+
+
+def find_shards(output_dir):
+    """
+    Lista as partes gravadas no diretório de saída.
+
+    Returns:
+        list: Tuplas ``(parte, total de partes, diretório)`` em ordem.
+    """
+    root = os.path.join(output_dir, SHARDS_DIRNAME)
+    if not os.path.isdir(root):
+        return []
+    shards = []
+    for name in sorted(os.listdir(root)):
+        match = _SHARD_PATTERN.match(name)
+        if match:
+            shards.append((int(match.group(1)), int(match.group(2)), os.path.join(root, name)))
+    return shards
@@ -0,0 +1,545 @@
+import os
+import json
+import numpy as np
+
+# Tentativas de sorteio de uma NFT antes de recorrer ao sorteio exaustivo
+MAX_ATTEMPTS = 1000
+# Tentativas sorteadas em lote para os IDs que repetem a combinação de um ID anterior
+PRECOMPUTED_ATTEMPTS = 8
+# Maior espaço de combinações enumerado por completo no sorteio exaustivo
+EXHAUSTIVE_LIMIT = 5_000_000
+# Probabilidade de uma NFT ser especial (em média uma a cada 10 IDs)
+SPECIAL_PROBABILITY = 0.1
+
+# Fluxos independentes de números aleatórios de cada NFT
+_STREAM_SPECIAL = 0
+_STREAM_SPECIAL_RARITY = 1
+_STREAM_FALLBACK = 2
+_STREAM_SPECIAL_ITEM = 1000  # + índice da camada
+_STREAM_ITEM = 2000  # + índice da camada
+
+_MASK64 = (1 << 64) - 1
+
+
+def _splitmix64(x):
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def token_uniforms(seed, token_ids, stream, attempt=0):
+    """
+    Gera números uniformes em [0, 1) que dependem apenas da semente, do ID da NFT,
+    do fluxo e da tentativa, sem estado compartilhado entre NFTs.
+
+    Args:
+        seed (int): Semente da geração.
+        token_ids (array-like): IDs das NFTs.
+        stream (int): Fluxo (decisão) para o qual o número é usado.
+        attempt (int): Tentativa de sorteio da NFT.
+
+    Returns:
+        np.ndarray: Um número por ID.
+    """
+    with np.errstate(over="ignore"):
+        x = _splitmix64(np.asarray(token_ids, dtype=np.uint64))
+        x = _splitmix64(x ^ np.uint64(seed & _MASK64))
+        x = _splitmix64(x ^ np.uint64(stream))
+        x = _splitmix64(x ^ np.uint64(attempt))
+    return (x >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+class CombinationPlan:
+    """
+    Plano de combinações de uma geração, calculado antes de qualquer renderização.
+
+    Attributes:
+        indices (np.ndarray): Matriz (N, camadas) com o índice do item de cada camada;
+            -1 indica uma camada ausente (NFTs especiais sem a raridade na camada).
+        codes (np.ndarray): Código inteiro (base mista) de cada combinação; -1 nas NFTs especiais.
+        special (np.ndarray): Índice da raridade especial de cada NFT, ou -1 para NFTs comuns.
+    """
+
+    def __init__(self, planner, indices, codes, special):
+        self.planner = planner
+        self.indices = indices
+        self.codes = codes
+        self.special = special
+
+    def __len__(self):
+        return len(self.indices)
+
+    def combination(self, row):
+        """
+        Retorna a lista de itens (camadas) da linha ``row`` do plano.
+        """
+        return [
+            self.planner.layer_items[layer][index]
+            for layer, index in enumerate(self.indices[row])
+            if index >= 0
+        ]
+
+    def special_rarity(self, row):
+        """
+        Retorna a raridade especial da linha ``row``, ou None se a NFT não for especial.
+        """
+        index = self.special[row]
+        return self.planner.special_rarities[index] if index >= 0 else None
+
+    def summary(self):
+        """
+        Resume o plano para inspeção.
+
+        Returns:
+            dict: Total de NFTs, especiais, combinações únicas e tamanho do espaço.
+        """
+        return {
+            "total": len(self),
+            "special": int(np.count_nonzero(self.special >= 0)),
+            "unique": int(np.count_nonzero(self.special < 0)),
+            "combination_space": self.planner.combination_space,
+        }
+
+
+class CombinationSet:
+    """
+    Conjunto compacto das combinações já geradas, para a unicidade entre gerações.
+
+    Cada item ``(nome, raridade, arquivo)`` é guardado uma única vez e cada combinação
+    vira uma linha de ids inteiros, então um milhão de combinações ocupa alguns
+    megabytes em vez de um milhão de tuplas de textos. Iterar devolve as combinações
+    no formato de tuplas de ``(nome, raridade, arquivo)``.
+    """
+
+    def __init__(self, keys=()):
+        """
+        Args:
+            keys (iterable): Combinações iniciais, como tuplas de ``(nome, raridade, arquivo)``.
+        """
+        self._item_ids = {}
+        self._items = []
+        self._blocks = []  # Matrizes (combinações, camadas) de ids, completadas com -1
+        self._rows = []  # Combinações adicionadas uma a uma, ainda fora de uma matriz
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        """
+        Adiciona uma combinação no formato de tupla de ``(nome, raridade, arquivo)``.
+        """
+        self._rows.append([self._item_id(tuple(part)) for part in key])
+
+    def add_plan(self, plan, rows):
+        """
+        Adiciona em lote as combinações das linhas ``rows`` de um plano.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        item_ids = [
+            np.array([self._item_id((item["name"], item["rarity"], item["file"])) for item in items], dtype=np.int32)
+            for items in plan.planner.layer_items
+        ]
+        indices = plan.indices[rows]
+        self._blocks.append(np.stack([ids[indices[:, layer]] for layer, ids in enumerate(item_ids)], axis=1))
+
+    def codes(self, planner):
+        """
+        Converte as combinações em códigos do ``planner``.
+
+        Combinações com outra quantidade de camadas ou com itens que não pertencem às
+        camadas do planner são ignoradas.
+
+        Returns:
+            np.ndarray: Códigos únicos das combinações.
+        """
+        matrix = self._matrix()
+        layer_count = len(planner.radices)
+        if not len(matrix) or matrix.shape[1] < layer_count:
+            return np.empty(0, dtype=planner.code_dtype)
+        valid = (matrix[:, layer_count:] < 0).all(axis=1)
+        indices = np.empty((len(matrix), layer_count), dtype=np.int64)
+        for layer, items in enumerate(planner.layer_items):
+            lookup = np.full(len(self._items) + 1, -1, dtype=np.int64)  # A última posição atende o -1
+            for index, item in enumerate(items):
+                item_id = self._item_ids.get((item["name"], item["rarity"], item["file"]))
+                if item_id is not None:
+                    lookup[item_id] = index
+            indices[:, layer] = lookup[matrix[:, layer]]
+        valid &= (indices >= 0).all(axis=1)
+        if not valid.any():
+            return np.empty(0, dtype=planner.code_dtype)
+        return np.unique(planner.encode(indices[valid]))
+
+    def save(self, path):
+        """
+        Grava o conjunto em um ``.npz`` compacto: a matriz de ids e os itens, cada um uma única vez.
+        """
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                matrix=self._matrix(),
+                items=np.frombuffer(json.dumps(self._items).encode("utf-8"), dtype=np.uint8),
+            )
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Carrega um conjunto gravado com ``save``.
+        """
+        combinations = cls()
+        with np.load(path) as data:
+            for item in json.loads(data["items"].tobytes().decode("utf-8")):
+                combinations._item_id(tuple(item))
+            matrix = data["matrix"].astype(np.int32)
+        if len(matrix):
+            combinations._blocks.append(matrix)
+        return combinations
+
+    def __len__(self):
+        return len(self._matrix())
+
+    def __iter__(self):
+        for row in self._matrix().tolist():
+            yield tuple(self._items[item_id] for item_id in row if item_id >= 0)
+
+    def _item_id(self, item):
+        item_id = self._item_ids.get(item)
+        if item_id is None:
+            item_id = self._item_ids[item] = len(self._items)
+            self._items.append(item)
+        return item_id
+
+    def _matrix(self):
+        # Junta as combinações em uma única matriz sem repetições
+        blocks = self._blocks
+        if self._rows:
+            width = max(len(row) for row in self._rows)
+            blocks = blocks + [np.array([row + [-1] * (width - len(row)) for row in self._rows], dtype=np.int32)]
+        if not blocks:
+            return np.empty((0, 0), dtype=np.int32)
+        width = max(block.shape[1] for block in blocks)
+        matrix = np.concatenate([
+            np.pad(block, ((0, 0), (0, width - block.shape[1])), constant_values=-1) for block in blocks
+        ])
+        matrix = np.unique(matrix, axis=0)
+        self._blocks, self._rows = [matrix], []
+        return matrix
+
+
+class CombinationPlanner:
+    """
+    Sorteia de uma só vez todas as combinações de uma geração.
+
+    Cada item de uma camada vira um dígito de um número em base mista, de modo que
+    toda combinação é um único inteiro. Os sorteios de cada NFT dependem apenas da
+    semente e do ID (ver ``token_uniforms``) e são feitos em lote para todos os IDs;
+    a unicidade é resolvida sobre os inteiros, na ordem dos IDs.
+    """
+
+    def __init__(self, layer_files, rarity_probabilities, seed=0, rules=None):
+        """
+        Args:
+            layer_files (list): Arquivos das camadas por raridade (ver ``load_layer_files_with_rarity``).
+            rarity_probabilities (dict): Probabilidade de cada raridade.
+            seed (int): Semente da geração.
+            rules (TraitRules): Regras de compatibilidade entre traços; combinações que
+                as violam nunca são sorteadas.
+        """
+        self.seed = seed
+        # Só raridades presentes em alguma camada: sem isso uma NFT especial poderia ficar sem camadas
+        self.special_rarities = [r for r in rarity_probabilities if any(layer.get(r) for layer in layer_files)]
+        self.layer_items = []
+        self.layer_weights = []
+        self.cumulative_weights = []
+        self.rarity_offsets = []  # Por camada: raridade -> (início, quantidade) em layer_items
+
+        for layer in layer_files:
+            available = [r for r in rarity_probabilities if layer.get(r)]
+            if not available:
+                raise ValueError("Nenhum item disponível para essa camada e raridade.")
+            total = sum(rarity_probabilities[r] for r in available)
+            items, weights, offsets = [], [], {}
+            for rarity in available:
+                files = layer[rarity]
+                offsets[rarity] = (len(items), len(files))
+                items.extend(files)
+                # Mesma distribuição de select_random_item_with_rarity:
+                # sorteia a raridade pelo peso e o item de forma uniforme dentro dela
+                weights.extend([rarity_probabilities[rarity] / total / len(files)] * len(files))
+            self.layer_items.append(items)
+            self.layer_weights.append(np.asarray(weights, dtype=np.float64))
+            self.cumulative_weights.append(np.cumsum(weights))
+            self.rarity_offsets.append(offsets)
+
+        self.radices = [len(items) for items in self.layer_items]
+        self.combination_space = 1
+        for radix in self.radices:
+            self.combination_space *= radix
+        # Acima de int64 os códigos passam a ser inteiros Python (dtype object)
+        self.code_dtype = np.int64 if self.combination_space < 2 ** 63 else object
+        strides, stride = [], 1
+        for radix in reversed(self.radices):
+            strides.append(stride)
+            stride *= radix
+        self.strides = np.asarray(strides[::-1], dtype=self.code_dtype)
+        self.rules = rules.compile(self.layer_items) if rules else None
+        self._valid_combinations = None
+        self._fallback_order = None
+        self.retries = 0  # Novas tentativas feitas para resolver combinações repetidas ou proibidas
+
+    def encode(self, indices):
+        """
+        Converte uma matriz (N, camadas) de índices em códigos inteiros.
+        """
+        return np.asarray(indices).astype(self.code_dtype) @ self.strides
+
+    def decode(self, codes):
+        """
+        Converte códigos inteiros de volta na matriz (N, camadas) de índices.
+        """
+        codes = np.asarray(codes, dtype=self.code_dtype)
+        indices = np.empty((len(codes), len(self.radices)), dtype=np.int64)
+        for layer, (radix, stride) in enumerate(zip(self.radices, self.strides)):
+            indices[:, layer] = (codes // stride) % radix
+        return indices
+
+    def allowed(self, indices):
+        """
+        Verifica em lote quais linhas de índices respeitam as regras de compatibilidade.
+
+        Returns:
+            np.ndarray: Máscara booleana; tudo True quando não há regras.
+        """
+        if self.rules is None:
+            return np.ones(len(indices), dtype=bool)
+        return self.rules.check(indices)
+
+    @property
+    def valid_combinations(self):
+        """
+        Quantidade de combinações que respeitam as regras (o espaço inteiro sem regras).
+
+        Returns:
+            tuple: (quantidade, True se a contagem é exata e não estimada).
+        """
+        if self._valid_combinations is None:
+            if self.rules is None:
+                self._valid_combinations = (self.combination_space, True)
+            else:
+                self._valid_combinations = self.rules.count_valid(self.seed)
+        return self._valid_combinations
+
+    def feasibility(self, count):
+        """
+        Informa se é possível gerar ``count`` combinações únicas.
+
+        Returns:
+            dict: Tamanho do espaço de combinações, combinações permitidas pelas regras
+                (e se a contagem é exata), quantidade pedida e se é viável.
+        """
+        valid, exact = self.valid_combinations
+        return {
+            "combination_space": self.combination_space,
+            "valid_combinations": valid,
+            "exact": exact,
+            "requested": count,
+            "feasible": count <= valid,
+        }
+
+    def draw_indices(self, token_ids, attempt=0):
+        """
+        Sorteia, ponderado pela raridade, o item de cada camada para os IDs informados.
+
+        Args:
+            token_ids (array-like): IDs das NFTs.
+            attempt (int): Tentativa de sorteio (usada quando a combinação já existe).
+
+        Returns:
+            np.ndarray: Matriz (N, camadas) de índices.
+        """
+        token_ids = np.asarray(token_ids)
+        indices = np.empty((len(token_ids), len(self.radices)), dtype=np.int64)
+        for layer, cumulative in enumerate(self.cumulative_weights):
+            values = token_uniforms(self.seed, token_ids, _STREAM_ITEM + layer, attempt) * cumulative[-1]
+            positions = np.searchsorted(cumulative, values, side="right")
+            indices[:, layer] = np.minimum(positions, len(cumulative) - 1)
+        return indices
+
+    def unique_codes(self, token_ids, exclude=None):
+        """
+        Define as combinações únicas dos IDs informados.
+
+        A primeira tentativa de todos os IDs é sorteada em lote; só os IDs cuja
+        combinação já pertence a um ID anterior (ou a ``exclude``) ou viola as regras
+        são sorteados de novo, com a tentativa seguinte. Quando o espaço está quase
+        esgotado, um sorteio ponderado sem reposição sobre todo o espaço completa o plano.
+
+        Args:
+            token_ids (array-like): IDs das NFTs, em ordem crescente.
+            exclude (array-like): Códigos que não podem ser sorteados (já gerados).
+
+        Returns:
+            np.ndarray: Código da combinação de cada ID.
+        """
+        token_ids = np.asarray(token_ids)
+        taken = set() if exclude is None else set(np.asarray(exclude).tolist())
+        valid_space, _ = self.valid_combinations
+        used = len(taken)
+        if self.rules is not None and taken:
+            used = int(self.allowed(self.decode(list(taken))).sum())
+        available = valid_space - used
+        if len(token_ids) > available:
+            raise ValueError(
+                f"Não é possível gerar {len(token_ids)} combinações únicas: "
+                f"apenas {available} de {self.combination_space} estão disponíveis."
+            )
+
+        codes = self._draw_codes(token_ids)
+
+        # Os IDs que repetem a primeira tentativa de um ID anterior ou que violam as
+        # regras quase sempre precisarão de novas tentativas; elas são sorteadas em
+        # lote de antemão
+        drawn = np.asarray([-1 if code is None else code for code in codes], dtype=self.code_dtype)
+        _, first = np.unique(drawn, return_index=True)
+        repeated = np.union1d(
+            np.setdiff1d(np.arange(len(codes)), first),
+            [position for position, code in enumerate(codes) if code is None],
+        ).astype(np.int64)
+        retries = {}
+        if len(repeated):
+            table = zip(*[
+                self._draw_codes(token_ids[repeated], attempt)
+                for attempt in range(1, PRECOMPUTED_ATTEMPTS + 1)
+            ])
+            retries = dict(zip(repeated.tolist(), table))
+
+        fallback_position = 0
+        for position, code in enumerate(codes):
+            attempt = 0
+            precomputed = retries.get(position, ())
+            while code is None or code in taken:
+                attempt += 1
+                if attempt > MAX_ATTEMPTS:
+                    code, fallback_position = self._fallback_code(taken, fallback_position)
+                    break
+                if attempt <= len(precomputed):
+                    code = precomputed[attempt - 1]
+                else:
+                    code = self._draw_codes(token_ids[position:position + 1], attempt)[0]
+            self.retries += attempt
+            taken.add(code)
+            codes[position] = code
+        return np.asarray(codes, dtype=self.code_dtype)
+
+    def _draw_codes(self, token_ids, attempt=0):
+        # Códigos de uma tentativa de sorteio, com None nas combinações proibidas pelas regras
+        indices = self.draw_indices(token_ids, attempt)
+        codes = self.encode(indices).tolist()
+        if self.rules is not None:
+            for position in np.flatnonzero(~self.rules.check(indices)).tolist():
+                codes[position] = None
+        return codes
+
+    def _fallback_code(self, taken, position):
+        """
+        Sorteio ponderado sem reposição sobre todo o espaço (chaves de Efraimidis-Spirakis).
+
+        As chaves dependem apenas da semente, então a ordem é calculada uma vez e
+        percorrida a partir de ``position``, pulando os códigos já usados.
+        """
+        if self._fallback_order is None:
+            if self.combination_space > EXHAUSTIVE_LIMIT:
+                raise ValueError("Não foi possível sortear combinações únicas suficientes.")
+            weights = np.ones(1)
+            for layer_weights in self.layer_weights:
+                weights = np.multiply.outer(weights, layer_weights).ravel()
+            values = token_uniforms(self.seed, np.arange(len(weights)), _STREAM_FALLBACK)
+            with np.errstate(divide="ignore"):
+                keys = np.log(values) / weights
+            order = np.argsort(-keys, kind="stable")
+            if self.rules is not None:
+                order = order[self.rules.check(self.decode(order))]
+            self._fallback_order = order.tolist()
+        while position < len(self._fallback_order) and self._fallback_order[position] in taken:
+            position += 1
+        if position == len(self._fallback_order):
+            raise ValueError("Não foi possível sortear combinações únicas suficientes.")
+        return self._fallback_order[position], position + 1
+
+    def plan(self, max_nfts, exclude=None):
+        """
+        Monta o plano completo da geração: NFTs especiais e combinações únicas.
+
+        Args:
+            max_nfts (int): Quantidade total de NFTs.
+            exclude (array-like): Códigos de combinações já geradas anteriormente.
+
+        Returns:
+            CombinationPlan: Plano com uma linha por NFT, na ordem dos IDs.
+        """
+        token_ids = np.arange(1, max_nfts + 1)
+        special = np.full(max_nfts, -1, dtype=np.int64)
+        indices = np.full((max_nfts, len(self.radices)), -1, dtype=np.int64)
+        codes = np.full(max_nfts, -1, dtype=self.code_dtype)
+
+        # Cada ID decide sozinho se é especial e qual a sua raridade especial
+        is_special = token_uniforms(self.seed, token_ids, _STREAM_SPECIAL) < SPECIAL_PROBABILITY
+        special_rows = np.flatnonzero(is_special)
+        special[special_rows] = (
+            token_uniforms(self.seed, token_ids[special_rows], _STREAM_SPECIAL_RARITY) * len(self.special_rarities)
+        ).astype(np.int64)
+        self._draw_special(token_ids, special_rows, special, indices)
+        if self.rules is not None:
+            # NFTs especiais que violam as regras sorteiam os itens de novo; as que não
+            # encontram uma combinação permitida na sua raridade viram NFTs comuns
+            attempt = 0
+            rejected = special_rows[~self.rules.check(indices[special_rows])]
+            impossible = [index for index in range(len(self.special_rarities)) if not self._special_allowed(index)]
+            demoted = rejected[np.isin(special[rejected], impossible)]
+            rejected = rejected[~np.isin(special[rejected], impossible)]
+            while len(rejected) and attempt < MAX_ATTEMPTS:
+                attempt += 1
+                self._draw_special(token_ids, rejected, special, indices, attempt)
+                rejected = rejected[~self.rules.check(indices[rejected])]
+            self.retries += attempt
+            rejected = np.concatenate([demoted, rejected])
+            is_special[rejected] = False
+            special[rejected] = -1
+            indices[rejected] = -1
+
+        regular = ~is_special
+        drawn = self.unique_codes(token_ids[regular], exclude=exclude)
+        codes[regular] = drawn
+        indices[regular] = self.decode(drawn)
+        return CombinationPlan(self, indices, codes, special)
+
+    def _special_allowed(self, rarity_index):
+        # Verifica se alguma combinação da raridade especial respeita as regras; espaços
+        # grandes demais para enumerar são considerados possíveis
+        rarity = self.special_rarities[rarity_index]
+        choices = []
+        for offsets in self.rarity_offsets:
+            start, size = offsets.get(rarity, (-1, 1))
+            choices.append(np.arange(start, start + size))
+        size = 1
+        for values in choices:
+            size *= len(values)
+        if size > EXHAUSTIVE_LIMIT:
+            return True
+        grid = np.stack([values.ravel() for values in np.meshgrid(*choices, indexing="ij")], axis=1)
+        return bool(self.rules.check(grid).any())
+
+    def _draw_special(self, token_ids, rows, special, indices, attempt=0):
+        # Sorteia, dentro da raridade especial de cada linha, o item de cada camada
+        for layer, offsets in enumerate(self.rarity_offsets):
+            for rarity_index, rarity in enumerate(self.special_rarities):
+                if rarity not in offsets:
+                    continue
+                selected = rows[special[rows] == rarity_index]
+                start, size = offsets[rarity]
+                values = token_uniforms(self.seed, token_ids[selected], _STREAM_SPECIAL_ITEM + layer, attempt)
+                indices[selected, layer] = start + (values * size).astype(np.int64)
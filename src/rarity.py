@@ -0,0 +1,184 @@
+import os
+import json
+import numpy as np
+
+RARITY_FILENAME = "rarity.json"
+RARITY_VERSION = 1
+
+
+class RarityEngine:
+    """
+    Ranking de raridade da coleção a partir da frequência de cada traço.
+
+    Mantém um contador por traço (o item de cada camada) atualizado a cada NFT
+    adicionada. O escore de uma NFT é o conteúdo de informação dos seus traços,
+    ``-Σ log2(frequência)``: quanto mais raros os traços, maior o escore, e a ordem
+    é a mesma da raridade estatística (produto das frequências). Uma camada ausente
+    em uma NFT conta como o traço "nenhum" daquela camada.
+
+    O estado (traços e NFTs) pode ser salvo e carregado, então NFTs novas entram no
+    ranking sem reler os metadados da coleção.
+    """
+
+    def __init__(self):
+        self.layers = []  # Nomes das camadas, na ordem em que apareceram
+        self._layer_ids = {}
+        self._values = []  # id do traço -> (camada, raridade, arquivo)
+        self._value_ids = {}
+        self._counts = []  # id do traço -> NFTs com o traço
+        # Traço de cada camada por ID de NFT (-1 para camada ausente) e IDs presentes,
+        # em arrays indexados pelo ID para a memória não depender de objetos por NFT
+        self._traits = np.full((0, 0), -1, dtype=np.int32)
+        self._present = np.zeros(0, dtype=bool)
+
+    def __len__(self):
+        return int(self._present.sum())
+
+    def add(self, nft_id, combination):
+        """
+        Adiciona uma NFT aos contadores; uma NFT com o mesmo ID é substituída.
+
+        Args:
+            nft_id (int): ID da NFT.
+            combination (list): Itens (camadas) da NFT.
+        """
+        self.remove(nft_id)
+        value_ids = []
+        for item in combination:
+            layer = self._layer_ids.get(item["name"])
+            if layer is None:
+                layer = self._layer_ids[item["name"]] = len(self.layers)
+                self.layers.append(item["name"])
+            key = (layer, item["file"])
+            value_id = self._value_ids.get(key)
+            if value_id is None:
+                value_id = self._value_ids[key] = len(self._values)
+                self._values.append((layer, item["rarity"], item["file"]))
+                self._counts.append(0)
+            self._counts[value_id] += 1
+            value_ids.append(value_id)
+        self._store(nft_id, value_ids)
+
+    def remove(self, nft_id):
+        """
+        Retira uma NFT dos contadores, se ela estiver no ranking.
+        """
+        if nft_id >= len(self._present) or not self._present[nft_id]:
+            return
+        for value_id in self._traits[nft_id].tolist():
+            if value_id >= 0:
+                self._counts[value_id] -= 1
+        self._traits[nft_id] = -1
+        self._present[nft_id] = False
+
+    def combination(self, nft_id):
+        """
+        Retorna os itens (camadas) de uma NFT do ranking.
+        """
+        return [
+            {"name": self.layers[layer], "rarity": rarity, "file": file}
+            for layer, rarity, file in (
+                self._values[value_id] for value_id in self._traits[nft_id].tolist() if value_id >= 0
+            )
+        ]
+
+    def _store(self, nft_id, value_ids):
+        rows, columns = self._traits.shape
+        if nft_id >= rows or len(self.layers) > columns:
+            # Cresce em blocos para manter o custo por NFT constante
+            if nft_id >= rows:
+                rows = max(2 * rows, nft_id + 1, 1024)
+            grown = np.full((rows, len(self.layers)), -1, dtype=np.int32)
+            grown[:self._traits.shape[0], :columns] = self._traits
+            self._traits = grown
+            present = np.zeros(rows, dtype=bool)
+            present[:len(self._present)] = self._present
+            self._present = present
+        for value_id in value_ids:
+            self._traits[nft_id, self._values[value_id][0]] = value_id
+        self._present[nft_id] = True
+
+    def trait_counts(self):
+        """
+        Retorna quantas NFTs têm cada traço.
+
+        Returns:
+            dict: Nome da camada -> {arquivo do item: quantidade}.
+        """
+        counts = {name: {} for name in self.layers}
+        for (layer, _, file), count in zip(self._values, self._counts):
+            if count:
+                counts[self.layers[layer]][os.path.basename(file)] = count
+        return counts
+
+    def rank(self):
+        """
+        Calcula escores e posições de todas as NFTs em uma única passada vetorizada.
+
+        A posição 1 é a NFT mais rara; NFTs com o mesmo escore dividem a posição.
+
+        Returns:
+            tuple: (IDs em ordem crescente, escores, posições), como arrays NumPy.
+        """
+        ids = np.flatnonzero(self._present).astype(np.int64)
+        total = len(ids)
+        if total == 0:
+            return ids, np.empty(0), np.empty(0, dtype=np.int64)
+        layer_count, value_count = len(self.layers), len(self._values)
+        value_layers = np.array([layer for layer, _, _ in self._values], dtype=np.int64)
+        counts = np.array(self._counts, dtype=np.int64)
+
+        # Matriz NFT x camada com o id do traço; camadas ausentes apontam para o traço
+        # "nenhum" da camada, que fica depois dos traços reais
+        traits = self._traits[ids].astype(np.int64)
+        traits = np.where(traits >= 0, traits, value_count + np.arange(layer_count))
+
+        present = np.bincount(value_layers, weights=counts, minlength=layer_count).astype(np.int64)
+        all_counts = np.concatenate([counts, total - present])
+        scores = -np.log2(all_counts[traits] / total).sum(axis=1)
+
+        # Escores arredondados para que somas iguais em outra ordem empatem
+        rounded = np.round(scores, 9)
+        order = np.lexsort((ids, -rounded))
+        ordered = rounded[order]
+        starts = np.r_[True, ordered[1:] != ordered[:-1]]
+        ranks = np.empty(total, dtype=np.int64)
+        ranks[order] = np.maximum.accumulate(np.where(starts, np.arange(1, total + 1), 0))
+        return ids, scores, ranks
+
+    def save(self, path):
+        """
+        Grava o estado do ranking em JSON.
+        """
+        data = {
+            "version": RARITY_VERSION,
+            "layers": self.layers,
+            "values": [list(value) for value in self._values],
+            "tokens": {
+                str(nft_id): [value_id for value_id in self._traits[nft_id].tolist() if value_id >= 0]
+                for nft_id in np.flatnonzero(self._present).tolist()
+            },
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Carrega um ranking salvo com ``save``; os contadores são refeitos a partir das NFTs.
+        """
+        with open(path, "r") as f:
+            data = json.load(f)
+        if data.get("version") != RARITY_VERSION:
+            raise ValueError(f"Versão de ranking de raridade não suportada: {path}")
+        engine = cls()
+        engine.layers = data["layers"]
+        engine._layer_ids = {name: index for index, name in enumerate(engine.layers)}
+        engine._values = [tuple(value) for value in data["values"]]
+        engine._value_ids = {(layer, file): index for index, (layer, _, file) in enumerate(engine._values)}
+        engine._counts = [0] * len(engine._values)
+        for nft_id, value_ids in data["tokens"].items():
+            engine._store(int(nft_id), value_ids)
+            for value_id in value_ids:
+                engine._counts[value_id] += 1
+        return engine
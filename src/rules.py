@@ -0,0 +1,194 @@
+import os
+import json
+import numpy as np
+
+# Maior quantidade de combinações das camadas com regras contada por enumeração;
+# acima disso a contagem é estimada por amostragem
+COUNT_LIMIT = 5_000_000
+COUNT_SAMPLES = 1_000_000
+
+RULE_TYPES = ("exclude", "require")
+
+
+class TraitRules:
+    """
+    Regras de compatibilidade entre traços, declaradas em um arquivo JSON::
+
+        {"rules": [
+            {"type": "exclude", "traits": [{"layer": "Hair", "rarity": "Exotic"},
+                                           {"layer": "Head", "rarity": "Common"}]},
+            {"type": "require", "if": {"layer": "T-shirt", "item": "X.png"},
+                                "then": {"layer": "Background", "item": ["Y.png", "Z.png"]}}
+        ]}
+
+    Um seletor escolhe itens de uma camada por raridade e/ou nome do arquivo (um nome
+    ou uma lista); sem os dois ele escolhe a camada inteira. ``exclude`` proíbe que
+    os dois traços apareçam juntos; ``require`` exige que uma NFT com o traço de
+    ``if`` tenha na outra camada um dos itens de ``then``.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        for rule in self.rules:
+            self._validate(rule)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(data.get("rules", []))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def to_dict(self):
+        return {"rules": self.rules}
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def compile(self, layer_items):
+        """
+        Compila as regras para os itens de cada camada (ver ``CombinationPlanner.layer_items``).
+
+        Returns:
+            CompiledRules: Tabelas de bits prontas para verificar combinações.
+        """
+        return CompiledRules(layer_items, self.rules)
+
+    @staticmethod
+    def _validate(rule):
+        kind = rule.get("type")
+        if kind not in RULE_TYPES:
+            raise ValueError(f"Tipo de regra inválido: '{kind}'. Use um de: {', '.join(RULE_TYPES)}.")
+        selectors = rule.get("traits", []) if kind == "exclude" else [rule.get("if"), rule.get("then")]
+        if len(selectors) != 2 or not all(isinstance(selector, dict) and "layer" in selector
+                                           for selector in selectors):
+            raise ValueError(f"Regra '{kind}' precisa de dois seletores com 'layer': {rule}")
+        if selectors[0]["layer"] == selectors[1]["layer"]:
+            raise ValueError(f"Regra entre itens da mesma camada: {rule}")
+
+
+class CompiledRules:
+    """
+    Regras compiladas em tabelas de bits por par de camadas.
+
+    Para cada par (camada A, camada B) com regras há uma tabela com uma linha por item
+    de A; cada linha é um bitset (palavras de 64 bits) dos itens de B permitidos junto
+    com aquele item. Cada camada tem uma posição extra para "camada ausente", usada
+    pelas NFTs especiais. Verificar uma combinação custa um deslocamento e um E por par.
+    """
+
+    def __init__(self, layer_items, rules):
+        self.radices = [len(items) for items in layer_items]
+        layer_ids = {}
+        for layer, items in enumerate(layer_items):
+            if items:
+                layer_ids[items[0]["name"]] = layer
+        tables = {}
+
+        def table(first, second):
+            key = (first, second)
+            if key not in tables:
+                words = (self.radices[second] + 1 + 63) // 64
+                tables[key] = np.full((self.radices[first] + 1, words), np.uint64(0xFFFFFFFFFFFFFFFF), dtype=np.uint64)
+            return tables[key]
+
+        for rule in rules:
+            if rule["type"] == "exclude":
+                first, second = rule["traits"]
+                a, b = self._layer(layer_ids, first), self._layer(layer_ids, second)
+                rows = self._matches(layer_items[a], first)
+                blocked = self._mask(self._matches(layer_items[b], second), self.radices[b] + 1)
+                table(a, b)[rows] &= ~blocked
+            else:
+                a, b = self._layer(layer_ids, rule["if"]), self._layer(layer_ids, rule["then"])
+                rows = self._matches(layer_items[a], rule["if"])
+                # Só os itens de "then" são permitidos; a camada ausente também não satisfaz a regra
+                allowed = self._mask(self._matches(layer_items[b], rule["then"]), self.radices[b] + 1)
+                table(a, b)[rows] &= allowed
+
+        self.pairs = [(a, b, values) for (a, b), values in sorted(tables.items())]
+        self.layers = sorted({layer for a, b, _ in self.pairs for layer in (a, b)})
+
+    @staticmethod
+    def _layer(layer_ids, selector):
+        layer = layer_ids.get(selector["layer"])
+        if layer is None:
+            raise ValueError(f"Camada desconhecida na regra: '{selector['layer']}'.")
+        return layer
+
+    @staticmethod
+    def _matches(items, selector):
+        names = selector.get("item")
+        if isinstance(names, str):
+            names = [names]
+        rarity = selector.get("rarity")
+        return np.array([
+            index for index, item in enumerate(items)
+            if (rarity is None or item["rarity"] == rarity)
+            and (names is None or os.path.basename(item["file"]) in names)
+        ], dtype=np.int64)
+
+    @staticmethod
+    def _mask(indices, size):
+        words = np.zeros((size + 63) // 64, dtype=np.uint64)
+        for index in indices.tolist():
+            words[index // 64] |= np.uint64(1 << (index % 64))
+        return words
+
+    def check(self, indices):
+        """
+        Verifica em lote quais combinações respeitam as regras.
+
+        Args:
+            indices (np.ndarray): Matriz (N, camadas) de índices; -1 indica camada ausente.
+
+        Returns:
+            np.ndarray: Máscara booleana das combinações permitidas.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        allowed = np.ones(len(indices), dtype=bool)
+        for a, b, values in self.pairs:
+            rows = np.where(indices[:, a] >= 0, indices[:, a], self.radices[a])
+            columns = np.where(indices[:, b] >= 0, indices[:, b], self.radices[b])
+            bits = values[rows, columns >> 6] >> (columns & 63).astype(np.uint64)
+            allowed &= (bits & np.uint64(1)).astype(bool)
+        return allowed
+
+    def count_valid(self, seed=0):
+        """
+        Conta as combinações (sem camadas ausentes) que respeitam as regras.
+
+        As camadas sem regras só multiplicam a contagem; as demais são enumeradas em
+        lotes se couberem em ``COUNT_LIMIT`` e amostradas caso contrário.
+
+        Returns:
+            tuple: (quantidade de combinações válidas, True se a contagem é exata).
+        """
+        free = 1
+        for layer, radix in enumerate(self.radices):
+            if layer not in self.layers:
+                free *= radix
+        constrained = [self.radices[layer] for layer in self.layers]
+        size = 1
+        for radix in constrained:
+            size *= radix
+
+        def valid_in(local):
+            indices = np.zeros((len(local), len(self.radices)), dtype=np.int64)
+            indices[:, self.layers] = local
+            return int(self.check(indices).sum())
+
+        if size <= COUNT_LIMIT:
+            valid = 0
+            for start in range(0, size, COUNT_SAMPLES):
+                codes = np.arange(start, min(start + COUNT_SAMPLES, size))
+                valid += valid_in(np.stack(np.unravel_index(codes, constrained), axis=1))
+            return valid * free, True
+
+        rng = np.random.default_rng(seed)
+        local = np.stack([rng.integers(radix, size=COUNT_SAMPLES) for radix in constrained], axis=1)
+        fraction = valid_in(local) / COUNT_SAMPLES
+        return int(round(fraction * size)) * free, False
@@ -0,0 +1,165 @@
+import json
+import time
+import threading
+from layer_cache import layer_footprint
+
+# Etapas medidas em uma geração
+STAGES = ("selection", "layer_load", "composite", "encode", "metadata_write")
+
+
+class _TimedCache:
+    """
+    Envolve um cache de camadas contando o tempo gasto em ``get`` como carregamento de camadas.
+    """
+
+    def __init__(self, cache, stats):
+        self._cache = cache
+        self._stats = stats
+
+    def get(self, path):
+        start = time.perf_counter()
+        try:
+            return self._cache.get(path)
+        finally:
+            self._stats.add("layer_load", time.perf_counter() - start)
+
+    def footprint(self, path, image):
+        if not hasattr(self._cache, "footprint"):
+            return layer_footprint(image)
+        return self._cache.footprint(path, image)
+
+
+class GenerationStats:
+    """
+    Instrumentação de uma geração: tempo por etapa, vazão, novas tentativas da
+    unicidade e taxas de acerto dos caches.
+
+    Ganchos registrados recebem eventos (dicts) durante a geração: ``start``,
+    ``token`` (uma vez por NFT concluída, com ``tokens`` e ``total``) e ``finish``
+    (com o resumo final).
+    """
+
+    def __init__(self, hooks=None):
+        """
+        Args:
+            hooks (list): Funções chamadas com cada evento da geração.
+        """
+        self.hooks = list(hooks or [])
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.stage_calls = dict.fromkeys(STAGES, 0)
+        self.tokens = 0
+        self.total = None  # NFTs a renderizar, conhecido depois do planejamento
+        self.retries = 0
+        self.caches = {}
+        self.extra = {}
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def emit(self, event, **data):
+        for hook in self.hooks:
+            hook({"event": event, **data})
+
+    def add(self, stage, seconds, calls=1):
+        """
+        Soma ``seconds`` ao tempo da etapa. Pode ser chamado de qualquer thread.
+        """
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.stage_calls[stage] = self.stage_calls.get(stage, 0) + calls
+
+    def measured(self):
+        """
+        Retorna as etapas medidas como {etapa: (segundos, chamadas)}, para enviar entre processos.
+        """
+        return {
+            stage: (seconds, self.stage_calls[stage])
+            for stage, seconds in self.stage_seconds.items() if self.stage_calls.get(stage)
+        }
+
+    def merge(self, measured):
+        """
+        Soma as etapas medidas em outro processo (ver ``measured``).
+        """
+        for stage, (seconds, calls) in measured.items():
+            self.add(stage, seconds, calls)
+
+    def timed(self, stage):
+        """
+        Gerenciador de contexto que mede um bloco como parte da etapa ``stage``.
+        """
+        return _StageTimer(self, stage)
+
+    def timed_cache(self, cache):
+        """
+        Retorna o cache de camadas com o tempo de ``get`` medido como ``layer_load``.
+        """
+        return _TimedCache(cache, self)
+
+    def start(self, **data):
+        self.started_at = time.perf_counter()
+        self.emit("start", **data)
+
+    def token_done(self, nft_id):
+        self.tokens += 1
+        self.emit("token", id=nft_id, tokens=self.tokens, total=self.total,
+                  elapsed=time.perf_counter() - self.started_at)
+
+    def finish(self, **caches):
+        """
+        Encerra a medição, registra as estatísticas finais dos caches e emite o resumo.
+        """
+        self.finished_at = time.perf_counter()
+        self.caches.update({name: cache.stats() for name, cache in caches.items()})
+        self.emit("finish", summary=self.summary())
+
+    def summary(self):
+        """
+        Resume a geração em um dict serializável em JSON.
+
+        Returns:
+            dict: Tempo total, vazão, tempo por etapa, novas tentativas e caches.
+        """
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        wall = end - self.started_at if self.started_at is not None else 0.0
+        return {
+            "tokens": self.tokens,
+            "wall_seconds": wall,
+            "tokens_per_sec": self.tokens / wall if wall else 0.0,
+            "stages": {
+                stage: {"seconds": seconds, "calls": self.stage_calls.get(stage, 0)}
+                for stage, seconds in self.stage_seconds.items()
+            },
+            "uniqueness_retries": self.retries,
+            "caches": self.caches,
+            **self.extra,
+        }
+
+    def to_json(self, path=None):
+        """
+        Exporta o resumo em JSON; grava em ``path`` se informado.
+
+        Returns:
+            str: Resumo em JSON.
+        """
+        text = json.dumps(self.summary(), indent=4)
+        if path:
+            with open(path, "w") as f:
+                f.write(text + "\n")
+        return text
+
+
+class _StageTimer:
+    def __init__(self, stats, stage):
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stats.add(self.stage, time.perf_counter() - self.start)
@@ -1,10 +1,12 @@
 import os
-import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from PIL import Image, ImageTk
 import json
-from generator import NFTGenerator
+from output_layout import DEFAULT_SHARD_SIZE, LARGE_COLLECTION_THRESHOLD
+
+# Taxa máxima de atualização da pré-visualização e do contador durante a geração
+PREVIEW_FPS = 10
+PREVIEW_SIZE = (600, 600)
 
 class NFTGeneratorApp:
     def __init__(self, root):
@@ -12,11 +14,26 @@ class NFTGeneratorApp:
         self.root.title("Felony | Gerador de NFTs")
         self.layer_dirs = []  
         self.output_dir = ""
-        self.generator = NFTGenerator()
+        self.rules_path = ""  # Arquivo JSON de regras de compatibilidade entre traços
+        self._generator = None  # Criado no primeiro uso (ver ``generator``)
         self.generated_nfts_count = 0
         self.selected_rarities = set()
+        # Última NFT gerada ainda não exibida: (imagem em memória ou None, caminho)
+        self._latest_preview = None
+        self.job = None  # Geração em andamento (GenerationJob)
         self.setup_ui()
 
+    @property
+    def generator(self):
+        """
+        Gerador de NFTs, importado e criado no primeiro uso para que o NumPy e o Pillow
+        não atrasem a abertura da janela.
+        """
+        if self._generator is None:
+            from generator import NFTGenerator
+            self._generator = NFTGenerator()
+        return self._generator
+
     def setup_ui(self):
         # Configuração da grid com 3 colunas: 0 (camadas/config), 1 (separador), 2 (preview)
         self.root.columnconfigure(0, weight=1, minsize=300)
@@ -82,9 +99,19 @@ class NFTGeneratorApp:
         image_format_menu = ttk.OptionMenu(image_format_frame, self.image_format_var, "png", "jpg", "jpeg")
         image_format_menu.grid(row=1, column=0, padx=5, pady=5)
 
-        # Botão Gerar NFTs
-        generate_button = ttk.Button(self.root, text="Gerar NFTs", command=self.start_generation_thread)
-        generate_button.grid(row=5, column=0, padx=10, pady=20)
+        # Botões Gerar, Pausar e Cancelar
+        generation_frame = ttk.Frame(self.root)
+        generation_frame.grid(row=5, column=0, padx=10, pady=20)
+
+        self.generate_button = ttk.Button(generation_frame, text="Gerar NFTs", command=self.start_generation_thread)
+        self.generate_button.grid(row=0, column=0, padx=5)
+
+        self.pause_button = ttk.Button(generation_frame, text="Pausar", command=self.toggle_pause, state="disabled")
+        self.pause_button.grid(row=0, column=1, padx=5)
+
+        self.cancel_button = ttk.Button(generation_frame, text="Cancelar", command=self.cancel_generation,
+                                        state="disabled")
+        self.cancel_button.grid(row=0, column=2, padx=5)
 
         # Linha de separação entre as colunas
         separator = ttk.Separator(self.root, orient="vertical")
@@ -113,6 +140,12 @@ class NFTGeneratorApp:
         load_config_button = ttk.Button(config_frame, text="Carregar Configurações", command=self.load_config)
         load_config_button.grid(row=0, column=1, padx=5, pady=5)
 
+        rules_button = ttk.Button(config_frame, text="Selecionar Regras de Traços", command=self.select_rules_file)
+        rules_button.grid(row=0, column=2, padx=5, pady=5)
+
+        self.rules_label = ttk.Label(config_frame, text="Regras: nenhuma")
+        self.rules_label.grid(row=0, column=3, padx=5, pady=5)
+
     def update_selected_rarities(self):
         self.selected_rarities = {rarity for rarity, var in self.rarity_vars.items() if var.get()}
 
@@ -125,11 +158,14 @@ class NFTGeneratorApp:
             self.layer_list.insert(tk.END, f"Camada: {layer_name} - Pasta: {layer_path}")
 
     def load_items_from_directory(self, directory):
+        # Os itens ficam em subpastas com o nome da raridade, lidas pelo índice de camadas
         items = []
-        for filename in os.listdir(directory):
-            if filename.endswith(('.png', '.jpg', '.jpeg')):
-                rarity = "Exotic" if "exotic" in filename.lower() else "Common"
-                items.append({"filename": filename, "rarity": rarity})
+        for rarity in self.generator.rarity_probabilities:
+            rarity_path = os.path.join(directory, rarity)
+            if os.path.isdir(rarity_path):
+                for entry in self.generator.asset_index.scan(rarity_path):
+                    items.append({"filename": entry["filename"], "rarity": rarity, "size": entry["size"]})
+        self.generator.asset_index.save()
         return items
 
     def remove_layer(self):
@@ -146,11 +182,87 @@ class NFTGeneratorApp:
         if self.output_dir:
             self.output_label.config(text=f"Pasta de Saída: {self.output_dir}")
 
+    def select_rules_file(self):
+        rules_path = filedialog.askopenfilename(title="Selecionar Regras de Traços", filetypes=[("JSON files", "*.json")])
+        if rules_path:
+            self.set_rules_path(rules_path)
+
+    def set_rules_path(self, rules_path):
+        self.rules_path = rules_path
+        self.rules_label.config(text=f"Regras: {os.path.basename(rules_path) if rules_path else 'nenhuma'}")
+
     def start_generation_thread(self):
-        thread = threading.Thread(target=self.generate_nfts)
-        thread.start()
+        if self.job is not None and not self.job.done:
+            return
+        self.job = self.generate_nfts()
+        if self.job is None:
+            return
+        self.generate_button.config(state="disabled")
+        self.pause_button.config(state="normal", text="Pausar")
+        self.cancel_button.config(state="normal")
+        self.schedule_preview_refresh()
+
+    def toggle_pause(self):
+        if self.job is None or self.job.done:
+            return
+        if self.job.state == "paused":
+            self.job.resume()
+            self.pause_button.config(text="Pausar")
+        else:
+            self.job.pause()
+            self.pause_button.config(text="Continuar")
+
+    def cancel_generation(self):
+        if self.job is None or self.job.done:
+            return
+        if messagebox.askyesno("Cancelar", "Cancelar a geração? As NFTs já geradas são mantidas."):
+            self.job.cancel()
+            self.pause_button.config(state="disabled")
+            self.cancel_button.config(state="disabled")
+
+    def finish_generation(self):
+        """
+        Informa o resultado da geração na thread do Tk e reativa o botão de gerar.
+        """
+        self.generate_button.config(state="normal")
+        self.pause_button.config(state="disabled", text="Pausar")
+        self.cancel_button.config(state="disabled")
+        try:
+            self.job.result()
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao gerar NFTs: {e}")
+            return
+        if self.job.cancelled:
+            messagebox.showinfo("Cancelada", f"Geração cancelada: {self.generated_nfts_count} NFTs geradas.")
+        else:
+            messagebox.showinfo("Sucesso", "NFTs geradas com sucesso!")
+
+    def schedule_preview_refresh(self):
+        self.root.after(int(1000 / PREVIEW_FPS), self.refresh_preview)
+
+    def refresh_preview(self):
+        """
+        Atualiza a pré-visualização e o contador na thread do Tk, no máximo PREVIEW_FPS vezes por segundo.
+
+        Só a última NFT gerada desde a atualização anterior é exibida; as demais são
+        descartadas sem redimensionamento.
+        """
+        latest, self._latest_preview = self._latest_preview, None
+        if latest is not None:
+            self.update_preview(*latest)
+        self.update_generated_count_label()
+        if not self.job.done or self._latest_preview is not None:
+            self.schedule_preview_refresh()
+        else:
+            self.finish_generation()
 
     def generate_nfts(self):
+        """
+        Valida os campos e inicia a geração em segundo plano.
+
+        Returns:
+            GenerationJob: Geração iniciada, ou None se algum campo é inválido.
+        """
         if not self.output_dir:
             messagebox.showerror("Erro", "Selecione a pasta de saída!")
             return
@@ -158,8 +270,8 @@ class NFTGeneratorApp:
         max_nfts = self.max_nfts_entry.get()
         if max_nfts.isdigit():
             max_nfts = int(max_nfts)
-            if max_nfts < 1 or max_nfts > 10000:
-                messagebox.showerror("Erro", "O número máximo de NFTs deve ser entre 1 e 10.000.")
+            if max_nfts < 1:
+                messagebox.showerror("Erro", "O número máximo de NFTs deve ser pelo menos 1.")
                 return
         else:
             messagebox.showerror("Erro", "Insira um número válido para a quantidade máxima de NFTs!")
@@ -172,23 +284,33 @@ class NFTGeneratorApp:
         try:
             image_format = self.image_format_var.get()
             selected_rarities = self.selected_rarities
+            preview_image = [None]  # Composição em memória da NFT mais recente
+
+            def keep_preview(image):
+                preview_image[0] = image
 
             def update_count(image_path):
+                # Chamado na thread de geração: só registra, o Tk é atualizado em refresh_preview
                 self.generated_nfts_count += 1
-                self.update_preview(image_path)
-                self.update_generated_count_label()
-
-            self.generator.generate(self.layer_dirs, self.output_dir, max_nfts=max_nfts,
-                                    image_format=image_format, rarities=selected_rarities,
-                                    callback=update_count)
-            messagebox.showinfo("Sucesso", "NFTs geradas com sucesso!")
+                self._latest_preview = (preview_image[0], image_path)
+
+            # Coleções grandes usam subdiretórios e não imprimem uma linha por NFT
+            large_collection = max_nfts > LARGE_COLLECTION_THRESHOLD
+            return self.generator.start(self.layer_dirs, self.output_dir, max_nfts=max_nfts,
+                                        image_format=image_format, rarities=selected_rarities,
+                                        callback=update_count, preview_callback=keep_preview,
+                                        shard_size=DEFAULT_SHARD_SIZE if large_collection else None,
+                                        verbose=not large_collection, rules=self.rules_path or None)
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao gerar NFTs: {e}")
 
-    def update_preview(self, image_path):
+    def update_preview(self, image, image_path):
+        from PIL import Image, ImageTk
+
         try:
-            image = Image.open(image_path)
-            image = image.resize((600, 600), Image.LANCZOS)
+            if image is None:
+                image = Image.open(image_path)
+            image = image.resize(PREVIEW_SIZE, Image.LANCZOS)
             image_tk = ImageTk.PhotoImage(image)
             self.preview_canvas.config(image=image_tk)
             self.preview_canvas.image = image_tk
@@ -204,7 +326,8 @@ class NFTGeneratorApp:
             "output_dir": self.output_dir,
             "max_nfts": self.max_nfts_entry.get(),
             "image_format": self.image_format_var.get(),
-            "rarities": list(self.selected_rarities)
+            "rarities": list(self.selected_rarities),
+            "rules": self.rules_path
         }
 
         file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
@@ -242,6 +365,8 @@ class NFTGeneratorApp:
                     var.set(rarity in rarities)
                 self.update_selected_rarities()
 
+                self.set_rules_path(config.get("rules", ""))
+
                 messagebox.showinfo("Sucesso", "Configurações carregadas com sucesso!")
             except Exception as e:
                 messagebox.showerror("Erro", f"Erro ao carregar configurações: {e}")
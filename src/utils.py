@@ -1,5 +1,9 @@
 import os
+import hashlib
 from PIL import Image
+from encoder import OutputSpec, encode_image
+from layer_cache import layer_footprint
+from composite import composite_over
 
 # Mapeamento de nomes de raridade para valores numéricos
 RARITY_VALUES = {
@@ -46,14 +50,71 @@ def create_metadata(nft_id, layers):
 
     return metadata
 
-def create_nft_image(layers, output_path):
+def load_layer_image(path):
+    """
+    Abre uma camada do disco e a converte para RGBA, sem cache.
+    """
+    with Image.open(path) as image:
+        return image.convert("RGBA")
+
+def save_image(image, output_path, spec=None):
+    """
+    Codifica a imagem em memória, grava no disco e retorna o SHA-256 dos bytes gravados.
+
+    Sem ``spec`` o formato é deduzido da extensão de ``output_path``.
+    """
+    if spec is None:
+        spec = OutputSpec(os.path.splitext(output_path)[1])
+    data = encode_image(image, spec)
+    with open(output_path, "wb") as f:
+        f.write(data)
+    return hashlib.sha256(data).hexdigest()
+
+def compose_layers(layers, cache=None, composite_cache=None):
+    """
+    Compõe as camadas em uma única imagem RGBA, sem salvar.
+
+    A imagem retornada pode ser compartilhada com os caches e não deve ser alterada.
+
+    Args:
+        layers (list): Itens da combinação, na ordem de empilhamento.
+        cache (LayerCache): Origem opcional das camadas com método ``get(caminho)``: um cache de
+            camadas decodificadas ou um ``AssetPack``, que lê os pixels do mapeamento sem cópia.
+        composite_cache (PrefixCompositeCache): Cache opcional de composições parciais.
+
+    Returns:
+        PIL.Image.Image: Imagem composta.
+    """
+    load = cache.get if cache is not None else load_layer_image
+    footprint = getattr(cache, "footprint", None)
+
+    if composite_cache is not None:
+        return composite_cache.compose(layers, load, footprint)
+
     # Inicializa a imagem base com a primeira camada
-    base_image = Image.open(layers[0]["file"]).convert("RGBA")
+    base_image = load(layers[0]["file"])
+    owned = cache is None  # Camadas do cache são compartilhadas e não podem ser alteradas
 
-    # Itera sobre as camadas restantes e compõe a imagem final
+    # Compõe as camadas restantes, tocando só a área visível de cada uma
     for layer in layers[1:]:
-        overlay = Image.open(layer["file"]).convert("RGBA")
-        base_image = Image.alpha_composite(base_image, overlay)
+        overlay = load(layer["file"])
+        area = footprint(layer["file"], overlay) if footprint else layer_footprint(overlay)
+        base_image, owned = composite_over(base_image, overlay, area, owned)
+    return base_image
+
+def create_nft_image(layers, output_path, cache=None, composite_cache=None):
+    """
+    Compõe as camadas e salva a imagem final.
+
+    Args:
+        layers (list): Itens da combinação, na ordem de empilhamento.
+        output_path (str): Caminho da imagem gerada.
+        cache (LayerCache): Origem opcional das camadas com método ``get(caminho)``: um cache de
+            camadas decodificadas ou um ``AssetPack``, que lê os pixels do mapeamento sem cópia.
+        composite_cache (PrefixCompositeCache): Cache opcional de composições parciais.
 
+    Returns:
+        str: SHA-256 da imagem gravada.
+    """
     # Salva a imagem final gerada
-    base_image.save(output_path)
+    return save_image(compose_layers(layers, cache, composite_cache), output_path)
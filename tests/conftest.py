@@ -0,0 +1,30 @@
+import os
+import sys
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from bench_pipeline import build_layer_tree
+
+
+def build_layers(root, layer_count=4, traits_per_rarity=2, size=16, seed=0):
+    """
+    Cria camadas sintéticas pequenas com o mesmo gerador do benchmark.
+    """
+    return build_layer_tree(root, layer_count, size, traits_per_rarity, seed=seed)
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    # O índice de camadas e o cache de atualizações ficam no diretório do teste
+    cache = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache))
+    return cache
+
+
+@pytest.fixture
+def layers(tmp_path):
+    return build_layers(str(tmp_path / "assets"))
@@ -0,0 +1,50 @@
+import os
+from PIL import Image
+import asset_index as asset_index_module
+from asset_index import AssetIndex
+
+
+def _save(path, size):
+    Image.new("RGBA", size).save(path)
+
+
+def test_unchanged_directory_is_not_listed_again(tmp_path, monkeypatch):
+    layer_dir = tmp_path / "layer"
+    layer_dir.mkdir()
+    _save(str(layer_dir / "a.png"), (8, 8))
+    index_path = str(tmp_path / "index.json")
+    index = AssetIndex(index_path)
+    first = index.scan(str(layer_dir))
+    index.save()
+
+    def scandir(path):
+        raise AssertionError(f"diretório listado de novo: {path}")
+
+    monkeypatch.setattr(asset_index_module.os, "scandir", scandir)
+    assert AssetIndex(index_path).scan(str(layer_dir)) == first
+
+
+def test_changed_directory_rereads_only_changed_files(tmp_path, monkeypatch):
+    _save(str(tmp_path / "a.png"), (8, 8))
+    index = AssetIndex("")
+    index.scan(str(tmp_path))
+    _save(str(tmp_path / "b.png"), (8, 8))
+    os.utime(str(tmp_path), ns=(0, 0))  # garante um mtime diferente do diretório
+
+    opened = []
+    original_open = asset_index_module.Image.open
+    monkeypatch.setattr(asset_index_module.Image, "open", lambda path: opened.append(path) or original_open(path))
+    entries = index.scan(str(tmp_path))
+    assert [entry["filename"] for entry in entries] == ["a.png", "b.png"]
+    assert opened == [str(tmp_path / "b.png")]
+
+
+def test_verify_detects_a_file_replaced_in_place(tmp_path):
+    path = str(tmp_path / "a.png")
+    _save(path, (8, 8))
+    index = AssetIndex("", verify=True)
+    index.scan(str(tmp_path))
+    mtime = os.stat(str(tmp_path)).st_mtime_ns
+    _save(path, (16, 16))
+    os.utime(str(tmp_path), ns=(mtime, mtime))
+    assert index.scan(str(tmp_path))[0]["size"] == (16, 16)
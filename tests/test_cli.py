@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import time
+import signal
+import subprocess
+from conftest import SRC_DIR, build_layers
+
+
+def _journal_ids(output_dir):
+    with open(os.path.join(output_dir, "journal.jsonl")) as f:
+        return sorted(json.loads(line)["id"] for line in f.readlines()[1:])
+
+
+def _file_ids(directory, extension):
+    # Acima de 10.000 NFTs os arquivos ficam em subdiretórios
+    return sorted(int(name[len("NFT_"):-len(extension)])
+                  for _, _, names in os.walk(directory) for name in names if name.endswith(extension))
+
+
+def _count_lines(path):
+    with open(path) as f:
+        return sum(1 for _ in f)
+
+
+def test_interrupt_multi_worker_run_leaves_consistent_output(tmp_path, cache_home):
+    layers = build_layers(str(tmp_path / "assets"), layer_count=4, traits_per_rarity=3, size=48)
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"layers": layers, "image_format": "png", "rarities": []}))
+    output_dir = tmp_path / "out"
+    env = {**os.environ, "XDG_CACHE_HOME": str(cache_home)}
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SRC_DIR, "cli.py"), str(config), "--max-nfts", "20000", "--workers", "3",
+         "--output-dir", str(output_dir)],
+        env=env, start_new_session=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    journal_path = output_dir / "journal.jsonl"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline and (not journal_path.exists() or _count_lines(journal_path) < 50):
+        assert process.poll() is None, process.communicate()
+        time.sleep(0.05)
+    # Como o Ctrl+C do terminal: o sinal vai para o grupo inteiro, inclusive os processos do pool
+    os.killpg(process.pid, signal.SIGINT)
+    _, stderr = process.communicate(timeout=120)
+
+    assert process.returncode == 130, stderr
+    assert "Traceback" not in stderr
+    ids = _journal_ids(str(output_dir))
+    assert 50 <= len(ids) < 20000
+    assert ids == list(range(1, len(ids) + 1))
+    assert _file_ids(output_dir / "nfts", ".png") == ids
+    assert _file_ids(output_dir / "metadata", ".json") == ids
+    assert _count_lines(output_dir / "metadata.csv") == len(ids) + 1
@@ -0,0 +1,15 @@
+from generator import NFTGenerator
+
+
+def test_id_order_does_not_use_the_composite_cache(layers, tmp_path):
+    generator = NFTGenerator()
+    stats = generator.generate(layers, str(tmp_path / "out"), max_nfts=20, seed=3, verbose=False)
+    assert generator.composite_cache.stats()["naive_composites"] == 0
+    assert "composite_cache" not in stats.summary()["caches"]
+
+
+def test_prefix_order_reuses_composites(layers, tmp_path):
+    generator = NFTGenerator()
+    stats = generator.generate(layers, str(tmp_path / "out"), max_nfts=20, seed=3, render_order="prefix",
+                               verbose=False)
+    assert stats.summary()["caches"]["composite_cache"]["naive_composites"] > 0
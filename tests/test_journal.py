@@ -0,0 +1,119 @@
+import os
+import csv
+import json
+import hashlib
+import pytest
+import generator as generator_module
+from generator import NFTGenerator
+from journal import GenerationJournal
+
+ITEM = {"name": "Layer0", "rarity": "Common", "file": "Layer0_Common_0.png"}
+
+
+def _tear_last_line(path):
+    # Simula uma queda no meio da escrita de uma linha do diário
+    with open(path, "a") as f:
+        f.write('{"type": "token", "id": 999, "combin')
+
+
+def test_reopen_discards_torn_last_line(tmp_path):
+    journal = GenerationJournal(str(tmp_path))
+    journal.start({"seed": 1})
+    for nft_id in (1, 2, 3):
+        journal.record(nft_id, [ITEM], "0" * 64)
+    journal.close()
+    _tear_last_line(journal.path)
+
+    journal.open()
+    journal.record(4, [ITEM], "0" * 64)
+    journal.close()
+
+    with open(journal.path) as f:
+        lines = f.read().splitlines()
+    assert [json.loads(line)["type"] for line in lines] == ["header", "token", "token", "token", "token"]
+    assert [entry["id"] for entry in journal.iter_tokens()] == [1, 2, 3, 4]
+    assert journal.read_header()["seed"] == 1
+
+
+def test_reopen_keeps_complete_journal(tmp_path):
+    journal = GenerationJournal(str(tmp_path))
+    journal.start({"seed": 1})
+    journal.record(1, [ITEM], "0" * 64)
+    journal.close()
+    with open(journal.path, "rb") as f:
+        before = f.read()
+    journal.open()
+    journal.close()
+    with open(journal.path, "rb") as f:
+        assert f.read() == before
+
+
+def test_read_header_requires_header(tmp_path):
+    journal = GenerationJournal(str(tmp_path))
+    with open(journal.path, "w") as f:
+        f.write(json.dumps({"type": "token", "id": 1}) + "\n")
+    with pytest.raises(ValueError):
+        journal.read_header()
+
+
+def _crash_at(monkeypatch, count):
+    """
+    Faz a composição falhar na chamada ``count``, como um Ctrl+C no meio da geração.
+
+    Returns:
+        list: Uma entrada por composição feita, para contar as NFTs renderizadas.
+    """
+    compose_layers = generator_module.compose_layers
+    calls = []
+
+    def compose(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == count:
+            raise KeyboardInterrupt
+        return compose_layers(*args, **kwargs)
+
+    monkeypatch.setattr(generator_module, "compose_layers", compose)
+    return calls
+
+
+def test_resume_after_crash_renders_only_missing_tokens(layers, tmp_path, monkeypatch):
+    output_dir = str(tmp_path / "out")
+    calls = _crash_at(monkeypatch, 30)
+    with pytest.raises(KeyboardInterrupt):
+        NFTGenerator().generate(layers, output_dir, max_nfts=80, seed=5, verbose=False)
+    journal = GenerationJournal(output_dir)
+    done = {entry["id"] for entry in journal.iter_tokens()}
+    assert 0 < len(done) < 80
+    _tear_last_line(journal.path)
+
+    crashed_at = len(calls)
+    NFTGenerator().generate(layers, output_dir, max_nfts=80, resume=True, verbose=False)
+
+    assert len(calls) - crashed_at == 80 - len(done)
+    entries = list(journal.iter_tokens())
+    assert sorted(entry["id"] for entry in entries) == list(range(1, 81))
+    for entry in entries:
+        with open(os.path.join(output_dir, "nfts", f"NFT_{entry['id']}.png"), "rb") as f:
+            assert hashlib.sha256(f.read()).hexdigest() == entry["sha256"]
+    with open(os.path.join(output_dir, "metadata.csv"), newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["name"] for row in rows] == [f"NFT #{nft_id}" for nft_id in range(1, 81)]
+
+
+def test_resume_reproduces_uninterrupted_run(layers, tmp_path, monkeypatch):
+    reference_dir = str(tmp_path / "reference")
+    NFTGenerator().generate(layers, reference_dir, max_nfts=40, seed=9, verbose=False)
+
+    output_dir = str(tmp_path / "out")
+    _crash_at(monkeypatch, 15)
+    with pytest.raises(KeyboardInterrupt):
+        NFTGenerator().generate(layers, output_dir, max_nfts=40, seed=9, verbose=False)
+    NFTGenerator().generate(layers, output_dir, max_nfts=40, resume=True, verbose=False)
+
+    def tokens(directory):
+        return {entry["id"]: (entry["combination"], entry["sha256"])
+                for entry in GenerationJournal(directory).iter_tokens()}
+
+    assert tokens(output_dir) == tokens(reference_dir)
+    with open(os.path.join(reference_dir, "metadata.csv")) as a, open(os.path.join(output_dir, "metadata.csv")) as b:
+        assert a.read() == b.read()
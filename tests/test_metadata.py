@@ -0,0 +1,59 @@
+import os
+import csv
+import json
+import pytest
+import generator as generator_module
+from generator import NFTGenerator
+from journal import GenerationJournal
+from metadata_writer import MetadataWriter
+
+
+def _rows(output_dir):
+    with open(os.path.join(output_dir, "metadata.csv"), newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_crashed_ranked_run_keeps_metadata_of_finished_tokens(layers, tmp_path, monkeypatch):
+    output_dir = str(tmp_path / "out")
+    compose_layers = generator_module.compose_layers
+    calls = []
+
+    def compose(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 40:
+            raise KeyboardInterrupt
+        return compose_layers(*args, **kwargs)
+
+    monkeypatch.setattr(generator_module, "compose_layers", compose)
+    with pytest.raises(KeyboardInterrupt):
+        NFTGenerator().generate(layers, output_dir, max_nfts=100, seed=4, verbose=False)
+
+    done = sorted(entry["id"] for entry in GenerationJournal(output_dir).iter_tokens())
+    assert done
+    assert sorted(int(row["name"].split("#")[1]) for row in _rows(output_dir)) == done
+    for nft_id in done:
+        with open(os.path.join(output_dir, "metadata", f"NFT_{nft_id}.json")) as f:
+            assert json.load(f)["name"] == f"NFT #{nft_id}"
+
+
+def test_ranked_run_rewrites_metadata_in_id_order(layers, tmp_path):
+    output_dir = str(tmp_path / "out")
+    NFTGenerator().generate(layers, output_dir, max_nfts=50, seed=4, verbose=False, render_order="prefix")
+    rows = _rows(output_dir)
+    assert [row["name"] for row in rows] == [f"NFT #{nft_id}" for nft_id in range(1, 51)]
+    assert sorted(int(row["rarity_rank"]) for row in rows)[0] == 1
+    with open(os.path.join(output_dir, "metadata", "NFT_7.json")) as f:
+        assert "rarity_rank" in json.load(f)
+    assert not [name for name in os.listdir(output_dir) if name.endswith(".tmp")]
+
+
+def test_interrupted_atomic_rewrite_keeps_previous_csv(tmp_path):
+    output_dir = str(tmp_path)
+    with MetadataWriter(output_dir) as writer:
+        writer.write(1, {"name": "NFT #1"})
+    with pytest.raises(KeyboardInterrupt):
+        with MetadataWriter(output_dir, atomic=True) as writer:
+            writer.write(1, {"name": "NFT #1", "rarity_rank": 1})
+            raise KeyboardInterrupt
+    assert [(row["name"], row["rarity_rank"]) for row in _rows(output_dir)] == [("NFT #1", "")]
+    assert sorted(os.listdir(output_dir)) == ["metadata", "metadata.csv"]
@@ -0,0 +1,38 @@
+import os
+from generator import NFTGenerator
+
+
+def _files(output_dir):
+    files = {}
+    for directory, _, names in os.walk(output_dir):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, output_dir)] = f.read()
+    return files
+
+
+def _generate(layers, output_dir, workers, **options):
+    rendered = []
+    NFTGenerator().generate(layers, output_dir, max_nfts=40, seed=3, workers=workers, verbose=False,
+                            callback=lambda path: rendered.append(os.path.relpath(path, output_dir)), **options)
+    return rendered
+
+
+def test_workers_match_serial_run(layers, tmp_path):
+    serial_dir, parallel_dir = str(tmp_path / "serial"), str(tmp_path / "parallel")
+    serial = _generate(layers, serial_dir, workers=1)
+    parallel = _generate(layers, parallel_dir, workers=3)
+
+    assert parallel == serial == [os.path.join("nfts", f"NFT_{nft_id}.png") for nft_id in range(1, 41)]
+    serial_files, parallel_files = _files(serial_dir), _files(parallel_dir)
+    assert "metadata.csv" in serial_files and len(serial_files) == 2 * 40 + 3  # + CSV, diário e rarity.json
+    assert parallel_files == serial_files
+
+
+def test_workers_keep_prefix_order_and_outputs(layers, tmp_path):
+    options = {"render_order": "prefix", "outputs": ["png", "jpg@8"], "shard_size": 16}
+    serial = _generate(layers, str(tmp_path / "serial"), workers=1, **options)
+    parallel = _generate(layers, str(tmp_path / "parallel"), workers=2, **options)
+    assert parallel == serial
+    assert _files(str(tmp_path / "parallel")) == _files(str(tmp_path / "serial"))
@@ -0,0 +1,89 @@
+import os
+import json
+import pytest
+import numpy as np
+from conftest import build_layers
+from generator import NFTGenerator
+from planner import CombinationPlanner, CombinationSet
+
+
+def _planner(layers, seed):
+    generator = NFTGenerator()
+    layer_files = generator.load_layer_files_with_rarity(layers, None)
+    return CombinationPlanner(layer_files, generator.rarity_probabilities, seed=seed)
+
+
+def test_same_seed_gives_same_plan(layers):
+    first = _planner(layers, 7).plan(500)
+    second = _planner(layers, 7).plan(500)
+    assert np.array_equal(first.indices, second.indices)
+    assert np.array_equal(first.special, second.special)
+
+
+def test_different_seed_gives_different_plan(layers):
+    assert not np.array_equal(_planner(layers, 7).plan(500).indices, _planner(layers, 8).plan(500).indices)
+
+
+def test_token_combination_does_not_depend_on_collection_size(layers):
+    # A combinação de cada ID depende só da semente e do ID
+    small = _planner(layers, 7).plan(100)
+    large = _planner(layers, 7).plan(500)
+    assert np.array_equal(small.indices, large.indices[:100])
+
+
+def test_regular_combinations_are_unique(layers):
+    plan = _planner(layers, 7).plan(2000)
+    regular = plan.codes[plan.special < 0]
+    assert len(np.unique(regular)) == len(regular)
+
+
+def test_excluded_combinations_are_not_drawn_again(layers):
+    planner = _planner(layers, 7)
+    previous = planner.plan(300)
+    exclude = previous.codes[previous.special < 0]
+    plan = _planner(layers, 7).plan(300, exclude=exclude)
+    assert not np.isin(plan.codes[plan.special < 0], exclude).any()
+
+
+def test_combination_set_round_trip(layers, tmp_path):
+    plan = _planner(layers, 7).plan(300)
+    combinations = CombinationSet()
+    combinations.add_plan(plan, np.flatnonzero(plan.special < 0))
+    combinations.save(str(tmp_path / "previous.npz"))
+    loaded = CombinationSet.load(str(tmp_path / "previous.npz"))
+    assert set(loaded) == set(combinations)
+    assert np.array_equal(loaded.codes(plan.planner), np.unique(plan.codes[plan.special < 0]))
+
+
+def test_render_token_reproduces_a_later_run(tmp_path):
+    # A segunda geração do mesmo NFTGenerator exclui as combinações da primeira; com poucas
+    # combinações possíveis, a exclusão muda o plano
+    layers = build_layers(str(tmp_path / "layers"), layer_count=3, traits_per_rarity=1)
+    generator = NFTGenerator(image_uri="ipfs://{cid}")
+    generator.generate(layers, str(tmp_path / "first"), max_nfts=150, seed=5, verbose=False)
+    output_dir = str(tmp_path / "second")
+    generator.generate(layers, output_dir, max_nfts=30, seed=5, outputs=["jpg@8"], verbose=False)
+    image_path = os.path.join(output_dir, "nfts", "NFT_17.jpg")
+    metadata_path = os.path.join(output_dir, "metadata", "NFT_17.json")
+    with open(image_path, "rb") as f:
+        image = f.read()
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    os.remove(image_path)
+    os.remove(metadata_path)
+
+    # Os parâmetros vêm do diário, não do NFTGenerator novo
+    NFTGenerator().render_token(None, 17, layers, output_dir)
+    with open(image_path, "rb") as f:
+        assert f.read() == image
+    with open(metadata_path) as f:
+        assert json.load(f) == metadata
+
+
+def test_render_token_rejects_arguments_that_differ_from_the_journal(layers, tmp_path):
+    output_dir = str(tmp_path / "out")
+    NFTGenerator().generate(layers, output_dir, max_nfts=10, seed=5, verbose=False)
+    with pytest.raises(ValueError, match="seed"):
+        NFTGenerator().render_token(6, 3, layers, output_dir)
+    with pytest.raises(ValueError, match="outputs"):
+        NFTGenerator().render_token(5, 3, layers, output_dir, image_format="jpg")
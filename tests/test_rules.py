@@ -0,0 +1,74 @@
+import itertools
+import numpy as np
+import pytest
+from generator import NFTGenerator
+from planner import CombinationPlanner
+from rules import TraitRules
+
+EXCLUDE = {"type": "exclude", "traits": [{"layer": "Layer1", "rarity": "Common"},
+                                         {"layer": "Layer2", "rarity": "Common"}]}
+REQUIRE = {"type": "require", "if": {"layer": "Layer3", "rarity": "Rare"},
+           "then": {"layer": "Layer0", "item": ["Layer0_Epic_0.png", "Layer0_Epic_1.png"]}}
+
+
+def _layer_files(layers):
+    generator = NFTGenerator()
+    return generator, generator.load_layer_files_with_rarity(layers, None)
+
+
+def _violations(combination):
+    traits = {item["name"]: item for item in combination}
+    violations = []
+    if "Layer1" in traits and "Layer2" in traits:
+        if traits["Layer1"]["rarity"] == "Common" and traits["Layer2"]["rarity"] == "Common":
+            violations.append("exclude")
+    if "Layer3" in traits and traits["Layer3"]["rarity"] == "Rare":
+        if "Layer0" not in traits or traits["Layer0"]["rarity"] != "Epic":
+            violations.append("require")
+    return violations
+
+
+def test_plan_respects_rules(layers):
+    generator, layer_files = _layer_files(layers)
+    planner = CombinationPlanner(layer_files, generator.rarity_probabilities, seed=3,
+                                 rules=TraitRules([EXCLUDE, REQUIRE]))
+    plan = planner.plan(2000)
+    assert not [row for row in range(len(plan)) if _violations(plan.combination(row))]
+
+
+def test_count_valid_matches_enumeration(layers):
+    _, layer_files = _layer_files(layers)
+    planner = CombinationPlanner(layer_files, NFTGenerator.rarity_probabilities, seed=3)
+    compiled = TraitRules([EXCLUDE, REQUIRE]).compile(planner.layer_items)
+    expected = sum(
+        1 for combination in itertools.product(*planner.layer_items) if not _violations(combination)
+    )
+    assert compiled.count_valid() == (expected, True)
+
+
+def test_check_treats_missing_layer_as_unmatched(layers):
+    _, layer_files = _layer_files(layers)
+    planner = CombinationPlanner(layer_files, NFTGenerator.rarity_probabilities, seed=3)
+    compiled = TraitRules([REQUIRE]).compile(planner.layer_items)
+    rare = planner.layer_items[3].index(next(item for item in planner.layer_items[3] if item["rarity"] == "Rare"))
+    # Sem a camada exigida a regra "require" não é satisfeita
+    assert compiled.check(np.array([[-1, 0, 0, rare], [-1, 0, 0, -1]])).tolist() == [False, True]
+
+
+@pytest.mark.parametrize("rule", [
+    {"type": "forbid", "traits": [{"layer": "Layer1"}, {"layer": "Layer2"}]},
+    {"type": "exclude", "traits": [{"layer": "Layer1"}]},
+    {"type": "exclude", "traits": [{"layer": "Layer1"}, {"layer": "Layer1", "rarity": "Rare"}]},
+    {"type": "require", "if": {"layer": "Layer1"}},
+])
+def test_invalid_rules_are_rejected(rule):
+    with pytest.raises(ValueError):
+        TraitRules([rule])
+
+
+def test_unknown_layer_is_rejected(layers):
+    _, layer_files = _layer_files(layers)
+    planner = CombinationPlanner(layer_files, NFTGenerator.rarity_probabilities)
+    rules = TraitRules([{"type": "exclude", "traits": [{"layer": "Layer1"}, {"layer": "Hat"}]}])
+    with pytest.raises(ValueError, match="Hat"):
+        rules.compile(planner.layer_items)
@@ -0,0 +1,100 @@
+import os
+import json
+import pytest
+from generator import NFTGenerator
+
+MAX_NFTS = 60
+SHARDS = 3
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def _metadata(output_dir):
+    directory = os.path.join(output_dir, "metadata")
+    return {name: json.loads(_read(os.path.join(directory, name))) for name in os.listdir(directory)}
+
+
+@pytest.fixture
+def plan_file(layers, tmp_path):
+    path = str(tmp_path / "plan.npz")
+    NFTGenerator().write_plan(layers, path, MAX_NFTS, seed=11)
+    return path
+
+
+def test_merged_shards_match_single_run(layers, tmp_path, plan_file):
+    single_dir = str(tmp_path / "single")
+    NFTGenerator().generate(layers, single_dir, plan_file=plan_file, verbose=False)
+
+    sharded_dir = str(tmp_path / "sharded")
+    # Cada parte roda com um NFTGenerator novo, como em outra máquina
+    for shard in range(1, SHARDS + 1):
+        NFTGenerator().generate(layers, sharded_dir, plan_file=plan_file, shard=(shard, SHARDS), verbose=False)
+    assert NFTGenerator().merge_shards(layers, sharded_dir, plan_file) == {"tokens": MAX_NFTS, "shards": SHARDS}
+
+    assert _read(os.path.join(sharded_dir, "metadata.csv")) == _read(os.path.join(single_dir, "metadata.csv"))
+    assert _metadata(sharded_dir) == _metadata(single_dir)
+    for nft_id in range(1, MAX_NFTS + 1):
+        name = f"NFT_{nft_id}.png"
+        with open(os.path.join(single_dir, "nfts", name), "rb") as a, \
+                open(os.path.join(sharded_dir, "nfts", name), "rb") as b:
+            assert a.read() == b.read()
+
+
+def test_merge_rejects_missing_shard(layers, tmp_path, plan_file):
+    output_dir = str(tmp_path / "out")
+    for shard in (1, 3):
+        NFTGenerator().generate(layers, output_dir, plan_file=plan_file, shard=(shard, SHARDS), verbose=False)
+    with pytest.raises(ValueError, match="Partes incompletas"):
+        NFTGenerator().merge_shards(layers, output_dir, plan_file)
+
+
+def test_merge_rejects_missing_token(layers, tmp_path, plan_file):
+    output_dir = str(tmp_path / "out")
+    for shard in range(1, SHARDS + 1):
+        NFTGenerator().generate(layers, output_dir, plan_file=plan_file, shard=(shard, SHARDS), verbose=False)
+    os.remove(os.path.join(output_dir, "nfts", "NFT_25.png"))
+    with pytest.raises(ValueError, match="NFT 25 sem arquivos"):
+        NFTGenerator().merge_shards(layers, output_dir, plan_file)
+
+
+def test_merge_accepts_resumed_shard(layers, tmp_path, plan_file):
+    # Uma parte retomada depois de uma queda tem a última linha do diário incompleta
+    output_dir = str(tmp_path / "out")
+    for shard in range(1, SHARDS + 1):
+        NFTGenerator().generate(layers, output_dir, plan_file=plan_file, shard=(shard, SHARDS), verbose=False)
+    journal_path = os.path.join(output_dir, "shards", f"0002-of-{SHARDS:04d}", "journal.jsonl")
+    with open(journal_path) as f:
+        lines = f.readlines()
+    with open(journal_path, "w") as f:
+        f.writelines(lines[:-1])
+        f.write(lines[-1][:len(lines[-1]) // 2])
+    NFTGenerator().generate(layers, output_dir, plan_file=plan_file, shard=(2, SHARDS), resume=True,
+                            verbose=False)
+    assert NFTGenerator().merge_shards(layers, output_dir, plan_file)["tokens"] == MAX_NFTS
+
+
+def test_merge_uses_the_image_uri_of_the_shards(layers, tmp_path, plan_file):
+    single_dir = str(tmp_path / "single")
+    NFTGenerator(image_uri="ipfs://{cid}").generate(layers, single_dir, plan_file=plan_file, verbose=False)
+
+    sharded_dir = str(tmp_path / "sharded")
+    for shard in range(1, SHARDS + 1):
+        NFTGenerator(image_uri="ipfs://{cid}").generate(layers, sharded_dir, plan_file=plan_file,
+                                                        shard=(shard, SHARDS), verbose=False)
+    # O NFTGenerator da junção tem o modelo padrão: vale o das partes
+    NFTGenerator().merge_shards(layers, sharded_dir, plan_file)
+    assert _metadata(sharded_dir) == _metadata(single_dir)
+    assert _read(os.path.join(sharded_dir, "metadata.csv")) == _read(os.path.join(single_dir, "metadata.csv"))
+
+
+def test_merge_rejects_shards_with_different_image_uris(layers, tmp_path, plan_file):
+    output_dir = str(tmp_path / "out")
+    for shard in range(1, SHARDS + 1):
+        image_uri = "ipfs://{cid}" if shard == 2 else "https://example.com/{id}.png"
+        NFTGenerator(image_uri=image_uri).generate(layers, output_dir, plan_file=plan_file,
+                                                   shard=(shard, SHARDS), verbose=False)
+    with pytest.raises(ValueError, match="modelos diferentes"):
+        NFTGenerator().merge_shards(layers, output_dir, plan_file)